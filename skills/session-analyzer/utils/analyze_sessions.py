@@ -12,14 +12,29 @@ Session Analyzer - JSONL 세션 로그 통합 분석 스크립트
 
 import json
 import argparse
+import atexit
 import sys
 import re
 import os
+import math
+import heapq
+import random
+import signal
+import hashlib
+import threading
+import time
+import tracemalloc
 from pathlib import Path
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import datetime, timedelta, timezone
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from difflib import SequenceMatcher
-from typing import List, Dict, Any, Tuple
+from fnmatch import fnmatch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from functools import lru_cache
+from itertools import repeat
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 
 
 # ============================================================================
@@ -111,63 +126,225 @@ BUILTIN_COMMANDS = {
 }
 
 
-def get_skill_and_command_names() -> Tuple[set, set]:
-    """~/.claude/skills/와 ~/.claude/commands/를 스캔하여 이름 세트 반환"""
-    home = Path.home()
-    skill_names = set()
-    command_names = set()
+# SKILL.md description의 첫 문장 끝: "다." "요." "니." "습." 또는 ". " 뒤 대문자/한글
+SKILL_DESC_SENTENCE_RE = re.compile(r'[다요니습]\.|\.\s+[A-Z가-힣]')
+
+SKILL_REGISTRY_CACHE_VERSION = 1
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    """경로의 mtime (없으면 None)"""
     try:
-        skills_dir = home / '.claude' / 'skills'
-        if skills_dir.is_dir():
-            for d in skills_dir.iterdir():
-                if d.is_dir() and (d / 'SKILL.md').exists():
-                    skill_names.add(d.name)
-    except Exception:
-        pass
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _path_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """(크기, mtime) 지문 (없으면 None)"""
     try:
-        commands_dir = home / '.claude' / 'commands'
-        if commands_dir.is_dir():
-            for p in commands_dir.glob('*.md'):
-                command_names.add(p.stem)
-    except Exception:
-        pass
-    return skill_names, command_names
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
 
 
-def get_skill_descriptions() -> dict:
-    """~/.claude/skills/*/SKILL.md frontmatter에서 description 첫 줄 추출"""
-    home = Path.home()
-    descriptions = {}
-    skills_dir = home / '.claude' / 'skills'
-    if not skills_dir.is_dir():
-        return descriptions
-    for d in skills_dir.iterdir():
-        if not d.is_dir() or not (d / 'SKILL.md').exists():
-            continue
+def _directory_stamps(roots: List[Tuple[str, Path]]) -> Tuple:
+    """루트와 프로젝트 디렉토리의 mtime 지문 (세션 파일 추가/삭제 감지용)"""
+    stamps = []
+    for _, root in roots:
+        stamps.append((str(root), _mtime_ns(root)))
         try:
-            content = (d / 'SKILL.md').read_text(encoding='utf-8')
-            if not content.startswith('---'):
+            stamps.extend((str(d), _mtime_ns(d)) for d in root.iterdir() if d.is_dir())
+        except OSError:
+            pass
+    return tuple(sorted(stamps))
+
+
+def _day_span(start_str: str, end_str: str) -> Tuple[datetime, datetime]:
+    """YYYY-MM-DD 시작/끝 날짜를 분석 범위 (시작일 0시, 끝일 23:59:59.999999)로 변환"""
+    start = datetime.strptime(start_str, '%Y-%m-%d')
+    end = datetime.strptime(end_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start, end
+
+
+def _span_inputs_unchanged(roots: List[Tuple[str, Path]], dir_stamps, file_stamps,
+                           start: datetime, end: datetime,
+                           include_projects: List[str] = None, exclude_projects: List[str] = None) -> bool:
+    """start~end 결과를 만든 입력이 지금도 같은 결과를 낼지 확인
+
+    기록한 세션 파일(결과에 쓰인 파일과 당시 타임스탬프가 없던 파일)은 (크기, mtime)이 모두 같아야 함. 디렉토리 mtime이 바뀐(또는 새로 생긴)
+    프로젝트에서는 결과에 없던 파일만 첫 기록 시각을 확인해 범위에 드는 세션이 있을 때만 무효.
+    세션 날짜는 첫 기록 시각이므로 다른 날짜에 새로 생긴 세션은 이 결과에 영향을 주지 않음.
+    """
+    if not all(_path_stamp(Path(p)) == (tuple(stamp) if stamp is not None else None)
+               for p, stamp in file_stamps):
+        return False
+    recorded = {path: mtime for path, mtime in dir_stamps}
+    known = {p for p, _ in file_stamps}
+    prune_before = start - MTIME_PRUNE_MARGIN
+    for _, root in roots:
+        try:
+            project_dirs = [d for d in root.iterdir() if d.is_dir()]
+        except OSError:
+            continue
+        for project_dir in project_dirs:
+            if recorded.get(str(project_dir)) == _mtime_ns(project_dir):
                 continue
-            end = content.find('---', 3)
-            if end <= 0:
+            if not project_matches(project_dir.name, include_projects, exclude_projects):
                 continue
-            frontmatter = content[3:end]
-            for line in frontmatter.split('\n'):
-                if line.strip().startswith('description:'):
-                    desc = line.split('description:', 1)[1].strip()
-                    if desc in ('|', '>'):
-                        next_lines = [l.strip() for l in frontmatter.split('description:')[1].split('\n')[1:] if l.strip()]
-                        desc = next_lines[0] if next_lines else ''
-                    # 첫 문장 추출: "다." "요." "다!" 또는 ". " 뒤 대문자 기준
-                    import re
-                    m = re.search(r'[다요니습]\.|\.\s+[A-Z가-힣]', desc)
-                    if m:
-                        desc = desc[:m.start() + 2].rstrip()
-                    descriptions[f'/{d.name}'] = desc
-                    break
+            if any(str(path) not in known for path, _ in _scan_project_dir(project_dir, start, end, prune_before)):
+                return False
+    return True
+
+
+def _parse_skill_description(skill_md: Path) -> Optional[str]:
+    """SKILL.md frontmatter에서 description 첫 문장 추출 (없으면 None)"""
+    content = skill_md.read_text(encoding='utf-8')
+    if not content.startswith('---'):
+        return None
+    end = content.find('---', 3)
+    if end <= 0:
+        return None
+    frontmatter = content[3:end]
+    for line in frontmatter.split('\n'):
+        if line.strip().startswith('description:'):
+            desc = line.split('description:', 1)[1].strip()
+            if desc in ('|', '>'):
+                next_lines = [l.strip() for l in frontmatter.split('description:')[1].split('\n')[1:] if l.strip()]
+                desc = next_lines[0] if next_lines else ''
+            m = SKILL_DESC_SENTENCE_RE.search(desc)
+            if m:
+                desc = desc[:m.start() + 2].rstrip()
+            return desc
+    return None
+
+
+class SkillRegistry:
+    """~/.claude/skills/와 ~/.claude/commands/ 스캔 결과 (스킬/커맨드 이름, 스킬 description)
+
+    프로세스당 한 번 로드하고(get_skill_registry), 결과를 캐시 파일에 저장합니다.
+    캐시는 skills/commands 디렉토리, 각 스킬 디렉토리와 SKILL.md의 mtime이 모두 같을 때만 재사용하며,
+    일부만 바뀐 경우 mtime이 같은 SKILL.md의 description은 다시 파싱하지 않습니다.
+    """
+
+    def __init__(self, claude_dir: Path = None, cache_path: Path = None):
+        self.claude_dir = claude_dir or Path.home() / '.claude'
+        self.skills_dir = self.claude_dir / 'skills'
+        self.commands_dir = self.claude_dir / 'commands'
+        self.cache_path = cache_path or self.claude_dir / 'summaries' / '.cache' / 'skill_registry.json'
+        self.skill_names = set()
+        self.command_names = set()
+        self.descriptions = {}
+        self.from_cache = False
+
+    def load(self) -> 'SkillRegistry':
+        cached = self._read_cache()
+        if cached and self._is_fresh(cached):
+            self._apply(cached)
+            self.from_cache = True
+            return self
+        snapshot = self._scan(cached)
+        self._apply(snapshot)
+        self._write_cache(snapshot)
+        return self
+
+    def _apply(self, snapshot: Dict[str, Any]) -> None:
+        self.skill_names = {name for name, entry in snapshot['skills'].items() if entry['skill_md'] is not None}
+        self.command_names = set(snapshot['commands'])
+        self.descriptions = {
+            f'/{name}': entry['description'] for name, entry in snapshot['skills'].items()
+            if entry.get('description') is not None
+        }
+
+    def _is_fresh(self, cached: Dict[str, Any]) -> bool:
+        """디렉토리/파일 mtime만 stat으로 비교 (파일 내용은 읽지 않음)"""
+        if (cached.get('version') != SKILL_REGISTRY_CACHE_VERSION
+                or cached.get('skills_mtime') != _mtime_ns(self.skills_dir)
+                or cached.get('commands_mtime') != _mtime_ns(self.commands_dir)):
+            return False
+        for name, entry in cached['skills'].items():
+            skill_dir = self.skills_dir / name
+            if (entry['dir_mtime'] != _mtime_ns(skill_dir)
+                    or entry['skill_md'] != _mtime_ns(skill_dir / 'SKILL.md')):
+                return False
+        return True
+
+    def _scan(self, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        previous_skills = (previous or {}).get('skills', {})
+        skills = {}
+        try:
+            if self.skills_dir.is_dir():
+                for d in self.skills_dir.iterdir():
+                    if not d.is_dir():
+                        continue
+                    skill_md = _mtime_ns(d / 'SKILL.md')
+                    entry = {'dir_mtime': _mtime_ns(d), 'skill_md': skill_md, 'description': None}
+                    old = previous_skills.get(d.name)
+                    if skill_md is not None and old and old.get('skill_md') == skill_md:
+                        entry['description'] = old.get('description')
+                    elif skill_md is not None:
+                        try:
+                            entry['description'] = _parse_skill_description(d / 'SKILL.md')
+                        except Exception:
+                            pass
+                    skills[d.name] = entry
+        except Exception:
+            pass
+        commands = []
+        try:
+            if self.commands_dir.is_dir():
+                commands = sorted(p.stem for p in self.commands_dir.glob('*.md'))
         except Exception:
             pass
-    return descriptions
+        return {
+            'version': SKILL_REGISTRY_CACHE_VERSION,
+            'skills_mtime': _mtime_ns(self.skills_dir),
+            'commands_mtime': _mtime_ns(self.commands_dir),
+            'skills': skills,
+            'commands': commands,
+        }
+
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            return cached if isinstance(cached, dict) and isinstance(cached.get('skills'), dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, snapshot: Dict[str, Any]) -> None:
+        # 캐시 저장 실패는 분석에 영향 없음
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_name(f'{self.cache_path.name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+
+_skill_registry = None
+
+
+def get_skill_registry() -> SkillRegistry:
+    """프로세스 전역 SkillRegistry (첫 호출 시 로드, 이후 같은 실행의 모든 분석이 공유)"""
+    global _skill_registry
+    if _skill_registry is None:
+        _skill_registry = SkillRegistry().load()
+    return _skill_registry
+
+
+def get_skill_and_command_names() -> Tuple[set, set]:
+    """~/.claude/skills/와 ~/.claude/commands/의 스킬/커스텀 커맨드 이름 세트 반환"""
+    registry = get_skill_registry()
+    return set(registry.skill_names), set(registry.command_names)
+
+
+def get_skill_descriptions() -> dict:
+    """~/.claude/skills/*/SKILL.md frontmatter에서 추출한 description 첫 문장 ('/이름' → 설명)"""
+    return dict(get_skill_registry().descriptions)
 
 
 BUILTIN_COMMAND_DESCRIPTIONS = {
@@ -255,62 +432,186 @@ BASH_ANTIPATTERN_EXCEPTIONS = [
 ]
 
 
+TOKEN_USAGE_FIELDS = (
+    'input_tokens', 'output_tokens',
+    'cache_creation_input_tokens', 'cache_read_input_tokens',
+)
+
+# 컨텍스트 윈도우 크기와 "한계 근접" 기준 비율
+CONTEXT_WINDOW_TOKENS = 200000
+CONTEXT_NEAR_LIMIT_RATIO = 0.8
+
+
 # ============================================================================
 # Section 2: Core Parsing
 # ============================================================================
 
-def parse_timestamp(timestamp_str: str) -> datetime:
-    """ISO 8601 타임스탬프를 datetime으로 변환"""
+def _parse_timestamp_fast(s: str) -> Optional[datetime]:
+    """'YYYY-MM-DDTHH:MM:SS[.fffffffff]Z' 형태를 고정 위치 슬라이싱으로 변환 (그 외 형태는 None)
+
+    소수부가 7~9자리(나노초)여도 마이크로초까지만 잘라 다른 'Z' 값과 같은 naive datetime으로 맞춤.
+    """
+    n = len(s)
+    if (n < 20 or s[-1] != 'Z' or s[4] != '-' or s[7] != '-' or s[10] != 'T'
+            or s[13] != ':' or s[16] != ':'):
+        return None
+    if n == 20:
+        micro = 0
+    elif s[19] == '.' and 21 <= n <= 30 and s[20:-1].isdigit():
+        micro = int(s[20:min(n - 1, 26)].ljust(6, '0'))
+    else:
+        return None
+    try:
+        return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                        int(s[11:13]), int(s[14:16]), int(s[17:19]), micro)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def _parse_timestamp_str(timestamp_str: str) -> Optional[datetime]:
+    """문자열 타임스탬프 변환 본체 (캐시되므로 같은 값에 대한 경고는 한 번만 출력됨)"""
+    dt = _parse_timestamp_fast(timestamp_str)
+    if dt is not None:
+        return dt
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(timestamp_str, fmt)
+        except ValueError:
+            continue
     try:
-        for fmt in [
-            "%Y-%m-%dT%H:%M:%S.%fZ",
-            "%Y-%m-%dT%H:%M:%SZ",
-            "%Y-%m-%dT%H:%M:%S.%f%z",
-            "%Y-%m-%dT%H:%M:%S%z",
-        ]:
-            try:
-                return datetime.strptime(timestamp_str, fmt)
-            except ValueError:
-                continue
         return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+    print(f"타임스탬프 파싱 실패: {timestamp_str!r}", file=sys.stderr)
+    return None
+
+
+def parse_timestamp(timestamp_str: str) -> Optional[datetime]:
+    """ISO 8601 타임스탬프를 datetime으로 변환 (실패 시 경고 후 None)
+
+    'Z' 접미사는 소수부 자릿수와 관계없이 naive datetime, 오프셋이 있으면 aware datetime을 반환.
+    잘못된 레코드의 dict/list 등 문자열이 아닌 값은 해시할 수 없으므로 캐시를 거치지 않고 실패 처리.
+    """
+    if isinstance(timestamp_str, str):
+        return _parse_timestamp_str(timestamp_str)
+    print(f"타임스탬프 파싱 실패: {timestamp_str!r}", file=sys.stderr)
+    return None
+
+
+# mtime 기반 가지치기 여유 (타임존 차이/첫 기록 지연 대비)
+MTIME_PRUNE_MARGIN = timedelta(days=1)
+
+
+def project_matches(project_name: str, include: List[str] = None, exclude: List[str] = None) -> bool:
+    """프로젝트 디렉토리 이름이 --project/--exclude-project 글롭 조건을 만족하는지 확인"""
+    if include and not any(fnmatch(project_name, pat) for pat in include):
+        return False
+    if exclude and any(fnmatch(project_name, pat) for pat in exclude):
+        return False
+    return True
+
+
+def _modified_before(path: Path, threshold: datetime) -> bool:
+    """path의 mtime(UTC)이 threshold보다 이전인지 (stat 실패 시 False)"""
+    try:
+        return datetime.fromtimestamp(path.stat().st_mtime, timezone.utc).replace(tzinfo=None) < threshold
+    except OSError:
+        return False
+
+
+# 세션 파일 → 첫 기록 시각. 기록은 뒤에 추가만 되므로 한 번 읽은 값은 프로세스 동안 유지
+_session_starts = {}
+
+
+def _session_start(jsonl_file: Path) -> Optional[datetime]:
+    """세션 파일의 첫 타임스탬프 기록 시각 (읽기 실패/기록 없음은 캐시하지 않고 None)"""
+    cached = _session_starts.get(jsonl_file)
+    if cached is not None:
+        return cached
+    try:
+        with open(jsonl_file, 'r', encoding='utf-8') as f:
+            for raw_line in f:
+                raw_line = raw_line.strip()
+                if not raw_line:
+                    continue
+                timestamp = json.loads(raw_line).get('timestamp')
+                if not timestamp:
+                    continue
+                session_date = parse_timestamp(timestamp)
+                if session_date is None:
+                    continue
+                _session_starts[jsonl_file] = session_date
+                return session_date
     except Exception:
-        return datetime.now()
+        pass
+    return None
 
 
-def find_session_files(projects_dir: Path, start_date: datetime, end_date: datetime) -> List[Path]:
-    """날짜 범위에 해당하는 메인 세션 JSONL 파일 찾기 (subagents 제외)"""
-    session_files = []
+def _scan_project_dir(project_dir: Path, start_date: datetime, end_date: datetime, prune_before: datetime,
+                      undated: List[Path] = None):
+    """프로젝트 디렉토리에서 첫 기록 시각이 범위에 드는 메인 세션 파일과 그 시각을 yield
+
+    undated를 주면 열어 봤지만 타임스탬프 기록이 아직 없는 파일을 추가 (나중에 기록이 붙으면 범위에 들 수 있음).
+    """
+    for jsonl_file in project_dir.glob("*.jsonl"):
+        if 'subagents' in str(jsonl_file):
+            continue
+        if _modified_before(jsonl_file, prune_before):
+            continue
+        session_date = _session_start(jsonl_file)
+        if session_date is None:
+            if undated is not None:
+                undated.append(jsonl_file)
+            continue
+        try:
+            in_range = start_date <= session_date <= end_date
+        except TypeError:
+            # naive/aware 혼재
+            continue
+        if in_range:
+            yield jsonl_file, session_date
+
+
+def discover_sessions(projects_dir: Path, start_date: datetime, end_date: datetime,
+                      include_projects: List[str] = None,
+                      exclude_projects: List[str] = None,
+                      undated: List[Path] = None) -> List[Tuple[Path, datetime]]:
+    """날짜 범위에 해당하는 메인 세션 JSONL 파일과 세션 시작 시각 찾기 (subagents 제외)
+
+    프로젝트 글롭 필터와 mtime으로 파일을 열기 전에 디렉토리/파일을 걸러냄.
+    세션 날짜는 첫 기록 시각이므로, 그 이후로 변경되지 않은 디렉토리(새 파일 없음)나
+    파일(추가 기록 없음)은 범위에 들 수 없음. undated는 _scan_project_dir 참고.
+    """
+    sessions = []
+    prune_before = start_date.replace(tzinfo=None) - MTIME_PRUNE_MARGIN
 
     for project_dir in projects_dir.iterdir():
         if not project_dir.is_dir():
             continue
+        if not project_matches(project_dir.name, include_projects, exclude_projects):
+            continue
+        if _modified_before(project_dir, prune_before):
+            continue
+        sessions.extend(_scan_project_dir(project_dir, start_date, end_date, prune_before, undated))
 
-        for jsonl_file in project_dir.glob("*.jsonl"):
-            if 'subagents' in str(jsonl_file):
-                continue
+    return sorted(sessions, key=lambda x: x[0])
 
-            try:
-                with open(jsonl_file, 'r', encoding='utf-8') as f:
-                    for raw_line in f:
-                        raw_line = raw_line.strip()
-                        if not raw_line:
-                            continue
-                        first_obj = json.loads(raw_line)
-                        timestamp = first_obj.get('timestamp')
-                        if not timestamp:
-                            continue
-                        session_date = parse_timestamp(timestamp)
-                        if start_date <= session_date <= end_date:
-                            session_files.append(jsonl_file)
-                        break
-            except Exception:
-                continue
 
-    return sorted(session_files)
+def find_session_files(projects_dir: Path, start_date: datetime, end_date: datetime,
+                       include_projects: List[str] = None,
+                       exclude_projects: List[str] = None) -> List[Path]:
+    """날짜 범위에 해당하는 메인 세션 JSONL 파일 찾기 (subagents 제외)"""
+    return [p for p, _ in discover_sessions(projects_dir, start_date, end_date,
+                                            include_projects, exclude_projects)]
 
 
 def _detect_config_change(file_path: str, tool_name: str, tool_input: dict = None) -> Dict[str, str]:
-    """Edit/Write 대상 파일이 스킬/커맨드/프로젝트 설정 파일인지 감지"""
+    """Edit/Write 대상 파일이 스킬/커맨드/프로젝트 설정 파일인지 감지
+
+    변경 설명(detail)은 여기서 추출하지 않고 입력 본문의 해시(detail_key)만 남김.
+    설명은 집계 단계에서 살아남은 항목만 resolve_change_details로 추출.
+    """
     result = {}
 
     # 스킬 파일: ~/.claude/skills/<skill_name>/...
@@ -349,11 +650,40 @@ def _detect_config_change(file_path: str, tool_name: str, tool_input: dict = Non
         }
 
     if result:
-        result['detail'] = _extract_change_detail(file_path, tool_name, tool_input or {})
+        result['detail_key'] = _change_digest(file_path, tool_name, tool_input or {})
 
     return result
 
 
+def _change_digest(file_path: str, tool_name: str, tool_input: dict) -> str:
+    """변경 설명을 결정하는 입력(경로, 도구, 본문)의 해시. 같은 해시면 같은 설명"""
+    digest = hashlib.blake2b(digest_size=8)
+    for part in (file_path, tool_name, tool_input.get('old_string', ''),
+                 tool_input.get('new_string', ''), tool_input.get('content', '')):
+        digest.update(str(part).encode('utf-8', 'surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _load_change_detail(change: Dict[str, Any]) -> str:
+    """detail_ref(세션 파일, 줄 오프셋, content 인덱스)로 원본 tool_use를 다시 읽어 변경 설명 추출
+
+    파일이 그 사이 바뀌어 입력 해시가 다르면 빈 문자열.
+    """
+    path, offset, index = change['detail_ref']
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            item = json.loads(f.readline())['message']['content'][index]
+        tool_name, tool_input = item['name'], item['input']
+        file_path = tool_input['file_path']
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return ''
+    if _change_digest(file_path, tool_name, tool_input) != change['detail_key']:
+        return ''
+    return _extract_change_detail(file_path, tool_name, tool_input)
+
+
 def _strip_code_blocks(text: str) -> str:
     """마크다운 텍스트에서 코드 블록(``` ... ```)을 제거"""
     return re.sub(r'```[\s\S]*?```', '', text)
@@ -457,6 +787,31 @@ def _sanitize_detail(detail: str) -> str:
     return detail
 
 
+@lru_cache(maxsize=1024)
+def _normalize_detail(detail: str) -> str:
+    """유사도 비교용 정규화 (구두점/공백 통일)"""
+    return re.sub(r'[\s.,;:]+', ' ', detail).strip().rstrip('.')
+
+
+def _merge_detail(result: list, detail: str, threshold: float = 0.75, limit: int = None) -> None:
+    """detail을 result에 추가. threshold 이상 유사한 항목이 있으면 더 긴(구체적인) 쪽만 유지
+
+    limit을 주면 앞 limit개 항목과만 비교하고 그 뒤는 버림. 유사 항목은 앞에서부터 찾으므로
+    버려지는 뒤쪽 항목은 앞 limit개의 결과에 영향을 주지 않음 (전체 중복 제거 후 [:limit]과 동일).
+    """
+    norm_detail = _normalize_detail(detail)
+    for i, existing in enumerate(result):
+        matcher = SequenceMatcher(None, norm_detail, _normalize_detail(existing))
+        # quick_ratio는 ratio의 상한이므로 먼저 걸러도 결과는 같음
+        if matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+                and matcher.ratio() >= threshold:
+            if len(detail) > len(existing):
+                result[i] = detail
+            return
+    if limit is None or len(result) < limit:
+        result.append(detail)
+
+
 def _deduplicate_details(details: list, threshold: float = 0.75) -> list:
     """의미적으로 유사한 detail을 제거. threshold 이상 유사도면 중복으로 판단."""
     if len(details) <= 1:
@@ -464,19 +819,27 @@ def _deduplicate_details(details: list, threshold: float = 0.75) -> list:
 
     result = []
     for detail in details:
-        norm_detail = re.sub(r'[\s.,;:]+', ' ', detail).strip().rstrip('.')
-        is_dup = False
-        for i, existing in enumerate(result):
-            norm_existing = re.sub(r'[\s.,;:]+', ' ', existing).strip().rstrip('.')
-            ratio = SequenceMatcher(None, norm_detail, norm_existing).ratio()
-            if ratio >= threshold:
-                is_dup = True
-                # 더 긴(구체적인) 쪽을 유지
-                if len(detail) > len(existing):
-                    result[i] = detail
-                break
-        if not is_dup:
-            result.append(detail)
+        _merge_detail(result, detail, threshold)
+    return result
+
+
+def resolve_change_details(changes: List[Dict[str, Any]], limit: int = 10) -> list:
+    """같은 (카테고리, 이름)의 변경 목록에서 유사 중복을 제거한 설명 앞 limit개를 추출
+
+    입력 해시가 같은 변경은 한 번만 원본에서 추출하고, 유사 중복 비교는 출력될 앞 limit개와만 수행.
+    결과는 모든 설명을 _deduplicate_details로 정리한 뒤 [:limit]한 것과 같음.
+    """
+    seen_keys = set()
+    seen_details = set()
+    result = []
+    for change in changes:
+        if change['detail_key'] in seen_keys:
+            continue
+        seen_keys.add(change['detail_key'])
+        detail = _load_change_detail(change)
+        if detail and detail not in seen_details:
+            seen_details.add(detail)
+            _merge_detail(result, detail, limit=limit)
     return result
 
 
@@ -584,13 +947,69 @@ def _extract_change_detail(file_path: str, tool_name: str, tool_input: dict) ->
     return '내용 변경'
 
 
-def parse_session_enhanced(file_path: Path, skill_names: set = None, command_names: set = None) -> Dict[str, Any]:
-    """세션 파일을 분석에 필요한 모든 데이터로 파싱"""
+def _content_stats(content: Any) -> Tuple[int, int]:
+    """tool_result content의 (UTF-8 바이트 수, 줄 수). 전체 문자열을 만들지 않고 블록별로 합산"""
+    if isinstance(content, str):
+        if not content:
+            return 0, 0
+        size = len(content) if content.isascii() else len(content.encode('utf-8'))
+        return size, content.count('\n') + 1
+    if isinstance(content, list):
+        size = lines = 0
+        for item in content:
+            if isinstance(item, dict):
+                if item.get('type') == 'image':
+                    # base64 이미지는 줄 수 없이 바이트만
+                    size += len((item.get('source') or {}).get('data') or '')
+                    continue
+                item_size, item_lines = _content_stats(item.get('text') or '')
+            else:
+                item_size, item_lines = _content_stats(item)
+            size += item_size
+            lines += item_lines
+        return size, lines
+    if content is None:
+        return 0, 0
+    return _content_stats(str(content))
+
+
+# 파서가 선택적으로 추출하는 필드 (리포트 섹션이 REPORT_SECTIONS에 필요 필드로 선언)
+# 메시지 수·턴·타임스탬프·도구 호출 골격(이름/id/배치/모델)·편집 파일·Bash 명령·Task/Skill 호출은 항상 추출
+PARSE_FIELDS = frozenset({
+    'user_text',       # user_messages
+    'all_text',        # all_text
+    'thinking',        # thinking_blocks
+    'commands',        # <command-name> 태그/슬래시 커맨드 탐지 (has_skill_calls, has_custom_command_calls, commands_used)
+    'tool_inputs',     # tool_uses[].input 보존 (없으면 빈 dict)
+    'tool_results',    # tool_results
+    'usage',           # usage_records
+    'config_changes',  # config_changes
+    'graph',           # tool_graph (tool_inputs, tool_results 필요)
+})
+
+
+def parse_session_enhanced(file_path: Path, skill_names: set = None, command_names: set = None,
+                           fields: frozenset = None) -> Dict[str, Any]:
+    """세션 파일을 분석에 필요한 데이터로 파싱
+
+    fields(PARSE_FIELDS의 부분집합)를 주면 해당 필드만 추출하고 나머지는 빈 값으로 둠. None이면 전체 추출.
+    """
     if skill_names is None:
         skill_names = set()
     if command_names is None:
         command_names = set()
+    if fields is None:
+        fields = PARSE_FIELDS
+    keep_user_text = 'user_text' in fields
+    keep_all_text = 'all_text' in fields
+    keep_thinking = 'thinking' in fields
+    detect_commands = 'commands' in fields
+    keep_inputs = 'tool_inputs' in fields
+    keep_results = 'tool_results' in fields
+    keep_usage = 'usage' in fields
+    detect_config = 'config_changes' in fields
     data = {
+        'session_id': file_path.stem,
         'user_messages': [],
         'tool_uses': [],
         'tool_results': [],
@@ -609,11 +1028,25 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
         'tool_sequence': [],
         'commands_used': [],
         'config_changes': [],
+        'usage_records': [],
+        'model_messages': Counter(),
+        'turns': [],
+        'compactions': [],
+        'first_timestamp': None,
+        'last_timestamp': None,
     }
+    seen_message_ids = set()
+    # 한 응답(message.id)에서 나온 tool_use 묶음 = 병렬 호출 배치
+    batch_key = None
+    batch_no = -1
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # 바이너리로 읽어 줄 오프셋을 유지 (설정 변경 설명을 나중에 해당 줄만 다시 읽어 추출)
+        with open(file_path, 'rb') as f:
+            offset = 0
             for line in f:
+                line_offset = offset
+                offset += len(line)
                 line = line.strip()
                 if not line:
                     continue
@@ -625,18 +1058,36 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
 
                 msg_type = obj.get('type')
                 message = obj.get('message', {})
-
-                if msg_type == 'user':
+                timestamp = obj.get('timestamp')
+                if timestamp and msg_type in ('user', 'assistant'):
+                    if data['first_timestamp'] is None:
+                        data['first_timestamp'] = timestamp
+                    data['last_timestamp'] = timestamp
+
+                if msg_type == 'system' and obj.get('subtype') == 'compact_boundary':
+                    meta = obj.get('compactMetadata') or {}
+                    data['compactions'].append({
+                        'timestamp': timestamp,
+                        'trigger': meta.get('trigger') or 'manual',
+                        'pre_tokens': meta.get('preTokens') or 0,
+                    })
+
+                elif msg_type == 'user':
                     data['total_messages'] += 1
                     content = message.get('content', '') if isinstance(message, dict) else ''
 
                     if isinstance(content, str):
                         if content.strip():
-                            data['user_messages'].append(content.strip())
-                            data['all_text'].append(content.strip())
+                            if keep_user_text:
+                                data['user_messages'].append(content.strip())
+                            if keep_all_text:
+                                data['all_text'].append(content.strip())
                             data['total_user_messages'] += 1
+                            data['turns'].append({'start': timestamp, 'end': None, 'prompt': content.strip()[:60]})
                             if '/compact' in content:
                                 data['has_compact'] = True
+                            if not detect_commands:
+                                continue
                             # <command-name> 태그에서 스킬/커스텀 커맨드/빌트인 3단계 분류
                             tag_match = re.findall(r'<command-name>\/([a-z][\w-]*)<\/command-name>', content)
                             for name in tag_match:
@@ -654,6 +1105,7 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
                                         data['commands_used'].append(cmd)
                     elif isinstance(content, list):
                         has_text = False
+                        first_text = ''
                         for item in content:
                             if not isinstance(item, dict):
                                 continue
@@ -662,11 +1114,17 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
                             if item_type == 'text':
                                 text = item.get('text', '').strip()
                                 if text:
-                                    data['user_messages'].append(text)
-                                    data['all_text'].append(text)
+                                    if keep_user_text:
+                                        data['user_messages'].append(text)
+                                    if keep_all_text:
+                                        data['all_text'].append(text)
+                                    if not has_text:
+                                        first_text = text
                                     has_text = True
                                     if '/compact' in text:
                                         data['has_compact'] = True
+                                    if not detect_commands:
+                                        continue
                                     # <command-name> 태그에서 스킬 감지
                                     skill_match = re.findall(r'<command-name>\/([a-z][\w-]*)<\/command-name>', text)
                                     for skill_name in skill_match:
@@ -678,44 +1136,81 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
                                             if cmd not in data['commands_used']:
                                                 data['commands_used'].append(cmd)
 
-                            elif item_type == 'tool_result':
-                                is_error = item.get('is_error', False)
+                            elif item_type == 'tool_result' and keep_results:
+                                is_error = item.get('is_error', False) is True
+                                raw_content = item.get('content', '')
+                                if 'content_bytes' in item:
+                                    # 축약 아카이브는 원본 크기를 보존
+                                    size, lines = item['content_bytes'], item.get('content_lines', 0)
+                                else:
+                                    size, lines = _content_stats(raw_content)
                                 data['tool_results'].append({
-                                    'is_error': is_error is True,
-                                    'content': str(item.get('content', ''))[:200],
+                                    'is_error': is_error,
+                                    # 내용 미리보기는 에러 분류에만 쓰이므로 에러 결과만 문자열화
+                                    'content': str(raw_content)[:200] if is_error else '',
                                     'tool_use_id': item.get('tool_use_id', ''),
+                                    'timestamp': timestamp,
+                                    'bytes': size,
+                                    'lines': lines,
                                 })
                         if has_text:
                             data['total_user_messages'] += 1
+                            data['turns'].append({'start': timestamp, 'end': None, 'prompt': first_text[:60]})
 
                 elif msg_type == 'assistant':
                     data['total_messages'] += 1
                     data['total_assistant_messages'] += 1
                     content = message.get('content', [])
+                    model = message.get('model') or 'unknown'
+                    data['model_messages'][model] += 1
+                    if data['turns'] and timestamp:
+                        # 턴 종료 = 다음 프롬프트 전 마지막 assistant 메시지 (턴 모델도 마지막 응답 기준)
+                        data['turns'][-1]['end'] = timestamp
+                        data['turns'][-1]['model'] = model
+
+                    # 한 API 응답이 블록별 레코드로 나뉘어 같은 usage가 반복되므로 message.id로 1회만 집계
+                    usage = message.get('usage')
+                    message_id = message.get('id')
+                    if keep_usage and isinstance(usage, dict) and (not message_id or message_id not in seen_message_ids):
+                        if message_id:
+                            seen_message_ids.add(message_id)
+                        record = {field: usage.get(field) or 0 for field in TOKEN_USAGE_FIELDS}
+                        record['model'] = message.get('model', '')
+                        record['timestamp'] = timestamp
+                        data['usage_records'].append(record)
 
                     if isinstance(content, list):
-                        for item in content:
+                        for item_index, item in enumerate(content):
                             if not isinstance(item, dict):
                                 continue
                             item_type = item.get('type', '')
 
                             if item_type == 'thinking':
+                                if not keep_thinking:
+                                    continue
                                 thinking_text = item.get('thinking', '') or item.get('text', '')
                                 if thinking_text:
                                     data['thinking_blocks'].append(thinking_text)
 
                             elif item_type == 'text':
                                 text = item.get('text', '').strip()
-                                if text:
+                                if text and keep_all_text:
                                     data['all_text'].append(text)
 
                             elif item_type == 'tool_use':
                                 tool_name = item.get('name', '')
                                 tool_input = item.get('input', {})
+                                key = message_id or ('record', data['total_messages'])
+                                if key != batch_key:
+                                    batch_key = key
+                                    batch_no += 1
                                 data['tool_uses'].append({
                                     'name': tool_name,
-                                    'input': tool_input,
+                                    'input': tool_input if keep_inputs else {},
                                     'id': item.get('id', ''),
+                                    'timestamp': timestamp,
+                                    'batch': batch_no,
+                                    'model': model,
                                 })
                                 data['tool_sequence'].append(tool_name)
 
@@ -724,8 +1219,9 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
                                     if fp:
                                         data['edit_write_files'][fp] += 1
                                         # 설정 파일 변경 감지
-                                        config_change = _detect_config_change(fp, tool_name, tool_input)
+                                        config_change = _detect_config_change(fp, tool_name, tool_input) if detect_config else None
                                         if config_change:
+                                            config_change['detail_ref'] = (str(file_path), line_offset, item_index)
                                             data['config_changes'].append(config_change)
 
                                 if tool_name == 'Bash':
@@ -749,9 +1245,296 @@ def parse_session_enhanced(file_path: Path, skill_names: set = None, command_nam
     except Exception as e:
         print(f"파싱 실패: {file_path} - {e}", file=sys.stderr)
 
+    data['tool_graph'] = build_tool_call_graph(data['tool_uses'], data['tool_results']) if 'graph' in fields else None
     return data
 
 
+# 실패 후 재시도로 보는 범위: 같은 도구를 RETRY_WINDOW 호출 이내에 유사한 입력으로 다시 호출
+RETRY_WINDOW = 3
+RETRY_SIMILARITY = 0.6
+# 재시도 체인에서 이만큼 연속 실패하면 재시도 루프로 간주
+RETRY_LOOP_MIN_FAILURES = 3
+
+
+def _retry_target(tool_use: Dict[str, Any]) -> Tuple[str, bool]:
+    """재시도 비교용 (대상, 정확히 같아야 하는지)
+
+    파일 경로는 프로젝트 접두사가 길어 유사도로는 다른 파일도 같게 보이므로 같은 파일일 때만 재시도로 봄.
+    명령어/패턴 등은 _tool_target을 유사도로 비교.
+    """
+    tool_input = tool_use.get('input') or {}
+    if isinstance(tool_input, dict) and not tool_input.get('command'):
+        path = tool_input.get('file_path') or tool_input.get('notebook_path')
+        if path:
+            return str(path), True
+    return _tool_target(tool_use), False
+
+
+def _similar_input(target_a: Tuple[str, bool], target_b: Tuple[str, bool]) -> bool:
+    """두 도구 호출 대상(_retry_target)이 재시도로 볼 만큼 유사한지"""
+    (text_a, exact_a), (text_b, exact_b) = target_a, target_b
+    if text_a == text_b:
+        return True
+    if exact_a or exact_b:
+        return False
+    return SequenceMatcher(None, text_a, text_b).ratio() >= RETRY_SIMILARITY
+
+
+def build_tool_call_graph(tool_uses: List[Dict[str, Any]], tool_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """세션의 도구 호출 그래프: tool_use→tool_result(id 조인)와 실패 후 재시도 체인
+
+    calls[i]는 tool_uses[i]에 대응: result(tool_results 인덱스), failed, retry_of/retried_by(calls 인덱스).
+    chains는 재시도 체인 시작(재시도가 아닌 실패 호출)부터 retried_by를 따라간 인덱스 목록.
+    """
+    result_index = {}
+    for i, tr in enumerate(tool_results):
+        if tr.get('tool_use_id'):
+            result_index.setdefault(tr['tool_use_id'], i)
+
+    calls = []
+    for tu in tool_uses:
+        r = result_index.get(tu.get('id'))
+        calls.append({
+            'name': tu.get('name', ''),
+            'result': r,
+            'failed': r is not None and tool_results[r].get('is_error') is True,
+            'retry_of': None,
+            'retried_by': None,
+        })
+
+    targets = None
+    for i, call in enumerate(calls):
+        if not call['failed']:
+            continue
+        if targets is None:
+            targets = [_retry_target(tu) for tu in tool_uses]
+        for j in range(i + 1, min(i + 1 + RETRY_WINDOW, len(calls))):
+            other = calls[j]
+            if other['name'] == call['name'] and other['retry_of'] is None and _similar_input(targets[i], targets[j]):
+                call['retried_by'] = j
+                other['retry_of'] = i
+                break
+
+    chains = []
+    for i, call in enumerate(calls):
+        if call['failed'] and call['retry_of'] is None:
+            chain = [i]
+            while calls[chain[-1]]['retried_by'] is not None:
+                chain.append(calls[chain[-1]]['retried_by'])
+            chains.append(chain)
+
+    return {'calls': calls, 'chains': chains}
+
+
+def get_tool_graph(session: Dict[str, Any]) -> Dict[str, Any]:
+    """파싱 시 만든 도구 호출 그래프 (없으면 생성)"""
+    graph = session.get('tool_graph')
+    if graph is None:
+        graph = build_tool_call_graph(session.get('tool_uses', []), session.get('tool_results', []))
+    return graph
+
+
+def summarize_tool_graph(graph: Dict[str, Any]) -> Dict[str, int]:
+    """실패 호출별 대응(재시도/다른 접근/세션 종료)과 재시도 체인 결과 집계"""
+    calls = graph['calls']
+    summary = {'failed_calls': 0, 'retry_same': 0, 'alternative_approach': 0, 'immediate_fix': 0,
+               'recovered': 0, 'retry_loops': 0}
+    for i, call in enumerate(calls):
+        if not call['failed']:
+            continue
+        summary['failed_calls'] += 1
+        if call['retried_by'] is not None:
+            summary['retry_same'] += 1
+        elif i + 1 < len(calls):
+            summary['alternative_approach'] += 1
+        else:
+            # 에러 후 세션 종료
+            summary['immediate_fix'] += 1
+    for chain in graph['chains']:
+        if len(chain) > 1 and not calls[chain[-1]]['failed']:
+            summary['recovered'] += 1
+        if sum(1 for i in chain if calls[i]['failed']) >= RETRY_LOOP_MIN_FAILURES:
+            summary['retry_loops'] += 1
+    return summary
+
+
+# ============================================================================
+# Section 2.5: Log Compaction (분석 전용 아카이브)
+# ============================================================================
+
+COMPACT_ARCHIVE_TYPE = 'compact-archive'
+COMPACT_ARCHIVE_VERSION = 1
+
+
+def _is_config_file(file_path: str) -> bool:
+    """_detect_config_change 대상이 될 수 있는 파일인지 (본문 보존 여부 판단용)"""
+    return bool(
+        re.search(r'/\.claude/(?:skills|commands)/', file_path)
+        or file_path.endswith('CLAUDE.md')
+        or file_path.endswith('.claude/settings.json')
+    )
+
+
+def _compact_tool_input(tool_name: str, tool_input: Any) -> Dict[str, Any]:
+    """tool_use input에서 파서가 사용하는 필드만 남김"""
+    if not isinstance(tool_input, dict):
+        return {}
+    if tool_name in ('Edit', 'Write'):
+        fp = tool_input.get('file_path', '')
+        # 설정 파일만 변경 내용(detail 추출용)을 보존
+        if fp and _is_config_file(fp):
+            return tool_input
+        return {'file_path': fp} if fp else {}
+    if tool_name == 'Task':
+        return {k: tool_input[k] for k in ('subagent_type', 'description') if k in tool_input}
+    return tool_input
+
+
+def compact_record(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """JSONL 레코드 하나를 분석 전용 최소 형태로 축약. 분석에 쓰이지 않는 레코드는 None"""
+    msg_type = obj.get('type')
+    if msg_type == 'system' and obj.get('subtype') == 'compact_boundary':
+        return {key: obj[key] for key in ('type', 'subtype', 'timestamp', 'compactMetadata') if key in obj}
+    if msg_type not in ('user', 'assistant'):
+        return None
+    message = obj.get('message', {})
+    content = message.get('content', '') if isinstance(message, dict) else ''
+    out = {'type': msg_type}
+    if obj.get('timestamp'):
+        out['timestamp'] = obj['timestamp']
+
+    if msg_type == 'user':
+        if isinstance(content, list):
+            items = []
+            for item in content:
+                if not isinstance(item, dict):
+                    continue
+                item_type = item.get('type', '')
+                if item_type == 'text':
+                    items.append({'type': 'text', 'text': item.get('text', '')})
+                elif item_type == 'tool_result':
+                    is_error = item.get('is_error', False) is True
+                    if 'content_bytes' in item:
+                        size, lines = item['content_bytes'], item.get('content_lines', 0)
+                    else:
+                        size, lines = _content_stats(item.get('content', ''))
+                    items.append({
+                        'type': 'tool_result',
+                        'tool_use_id': item.get('tool_use_id', ''),
+                        'is_error': is_error,
+                        'content': str(item.get('content', ''))[:200] if is_error else '',
+                        'content_bytes': size,
+                        'content_lines': lines,
+                    })
+            content = items
+        out['message'] = {'content': content}
+    else:
+        items = []
+        if isinstance(content, list):
+            # thinking/text 블록은 리포트에 쓰이지 않으므로 제외
+            for item in content:
+                if isinstance(item, dict) and item.get('type') == 'tool_use':
+                    name = item.get('name', '')
+                    items.append({
+                        'type': 'tool_use',
+                        'id': item.get('id', ''),
+                        'name': name,
+                        'input': _compact_tool_input(name, item.get('input', {})),
+                    })
+        out['message'] = {'content': items}
+        if isinstance(message, dict):
+            for key in ('id', 'model'):
+                if message.get(key):
+                    out['message'][key] = message[key]
+            if isinstance(message.get('usage'), dict):
+                out['message']['usage'] = {k: v for k, v in message['usage'].items() if k in TOKEN_USAGE_FIELDS}
+    return out
+
+
+def is_compact_archive(file_path: Path) -> bool:
+    """첫 줄 헤더로 이미 축약된 아카이브인지 확인"""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            first = json.loads(f.readline() or '{}')
+        return first.get('type') == COMPACT_ARCHIVE_TYPE
+    except Exception:
+        return False
+
+
+def compact_session_file(src: Path, dest: Path) -> Tuple[int, int]:
+    """세션 파일을 축약 아카이브로 저장. (원본 바이트, 축약 바이트) 반환"""
+    records = []
+    first_ts = None
+    with open(src, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if first_ts is None and obj.get('timestamp'):
+                first_ts = obj['timestamp']
+            compacted = compact_record(obj)
+            if compacted is not None:
+                records.append(compacted)
+
+    # 헤더의 timestamp로 find_session_files가 원본과 같은 날짜로 인식
+    header = {'type': COMPACT_ARCHIVE_TYPE, 'version': COMPACT_ARCHIVE_VERSION, 'source': src.name}
+    if first_ts:
+        header['timestamp'] = first_ts
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with open(dest, 'w', encoding='utf-8') as f:
+        for obj in [header] + records:
+            f.write(json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n')
+    return src.stat().st_size, dest.stat().st_size
+
+
+def _analysis_fingerprint(parsed: Dict[str, Any]) -> str:
+    """단일 세션 분석 결과를 비교용 문자열로 변환"""
+    epoch = datetime(1970, 1, 1)
+    valid = parsed['total_user_messages'] >= 1 and len(parsed['tool_uses']) >= 1
+    result = _build_analysis_result([parsed], epoch, epoch)
+    return json.dumps([valid, result], ensure_ascii=False, sort_keys=True)
+
+
+def compact_sessions(files: List[Path], projects_dir: Path, dest_dir: Path) -> Dict[str, Any]:
+    """세션 파일들을 축약하고 원본과 분석 결과가 동일한지 검증"""
+    skill_names, command_names = get_skill_and_command_names()
+    summary = {'files': 0, 'skipped': 0, 'verified': 0, 'mismatched': [],
+               'bytes_before': 0, 'bytes_after': 0, 'ratio': 0}
+
+    for src in files:
+        if is_compact_archive(src):
+            summary['skipped'] += 1
+            continue
+        dest = dest_dir / src.relative_to(projects_dir)
+        try:
+            before, after = compact_session_file(src, dest)
+        except Exception as e:
+            print(f"축약 실패: {src} - {e}", file=sys.stderr)
+            continue
+        summary['files'] += 1
+
+        original = parse_session_enhanced(src, skill_names, command_names)
+        compacted = parse_session_enhanced(dest, skill_names, command_names)
+        if _analysis_fingerprint(original) != _analysis_fingerprint(compacted):
+            # 분석 결과가 달라지는 아카이브는 남기지 않음
+            dest.unlink()
+            summary['mismatched'].append(str(src))
+            continue
+
+        summary['verified'] += 1
+        summary['bytes_before'] += before
+        summary['bytes_after'] += after
+
+    if summary['bytes_after']:
+        summary['ratio'] = round(summary['bytes_before'] / summary['bytes_after'], 1)
+    return summary
+
+
 # ============================================================================
 # Section 3: Analysis Functions
 # ============================================================================
@@ -801,15 +1584,20 @@ def classify_task_types(session: Dict[str, Any]) -> List[str]:
     return matched if matched else ['General']
 
 
-def analyze_tool_usage(sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """도구 사용 빈도 분석 (Top 5)"""
+def count_tool_names(sessions: List[Dict[str, Any]]) -> Counter:
+    """도구 이름별 호출 수"""
     counter = Counter()
     for session in sessions:
         for tu in session.get('tool_uses', []):
             name = tu.get('name')
             if name:
                 counter[name] += 1
-    return [{'name': name, 'count': count} for name, count in counter.most_common(5)]
+    return counter
+
+
+def analyze_tool_usage(sessions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """도구 사용 빈도 분석 (Top 5)"""
+    return [{'name': name, 'count': count} for name, count in count_tool_names(sessions).most_common(5)]
 
 
 def extract_thinking_insights(sessions: List[Dict[str, Any]], max_per_session: int = 5) -> List[str]:
@@ -835,19 +1623,820 @@ def extract_thinking_insights(sessions: List[Dict[str, Any]], max_per_session: i
     return insights[:20]
 
 
-def analyze_workflow_patterns(sessions: List[Dict[str, Any]]) -> str:
+class NGramIndex:
+    """도구 시퀀스의 계수 n-gram 트라이 (길이 max_len까지)
+
+    각 위치에서 최대 max_len개 토큰만 내려가며 카운트하므로 전체 도구 호출 수에 선형.
+    노드: [출현 횟수, 최초 출현 순번, 자식 dict] — 순번은 Counter.most_common과 같은 동률 처리용.
+    """
+
+    def __init__(self, max_len: int = 8):
+        self.max_len = max_len
+        self.root = [0, 0, {}]
+        self._created = 0
+
+    def add(self, seq: List[str]) -> None:
+        for i in range(len(seq)):
+            node = self.root
+            for name in seq[i:i + self.max_len]:
+                children = node[2]
+                child = children.get(name)
+                if child is None:
+                    self._created += 1
+                    child = children[name] = [0, self._created, {}]
+                child[0] += 1
+                node = child
+
+    def _walk(self, node, prefix, min_len, max_len):
+        for name, child in node[2].items():
+            pattern = prefix + (name,)
+            if len(pattern) >= min_len:
+                yield pattern, child
+            if len(pattern) < max_len:
+                yield from self._walk(child, pattern, min_len, max_len)
+
+    def top(self, k: int, min_len: int = 2, max_len: int = None, closed: bool = False) -> List[Tuple[tuple, int]]:
+        """빈도 상위 k개 패턴. closed=True면 같은 빈도로 더 길게 확장되는 패턴은 제외"""
+        max_len = max_len or self.max_len
+        candidates = (
+            (pattern, node) for pattern, node in self._walk(self.root, (), min_len, max_len)
+            if not closed or all(child[0] < node[0] for child in node[2].values())
+        )
+        best = heapq.nsmallest(k, candidates, key=lambda x: (-x[1][0], x[1][1]))
+        return [(pattern, node[0]) for pattern, node in best]
+
+    def count(self, pattern: tuple) -> int:
+        """패턴의 출현 횟수 (max_len보다 길거나 없으면 0)"""
+        if not pattern or len(pattern) > self.max_len:
+            return 0
+        node = self.root
+        for name in pattern:
+            node = node[2].get(name)
+            if node is None:
+                return 0
+        return node[0]
+
+
+def build_workflow_index(sessions: List[Dict[str, Any]], max_len: int = 8) -> NGramIndex:
+    """전체 세션의 tool_sequence로 n-gram 인덱스 생성"""
+    index = NGramIndex(max_len)
+    for session in sessions:
+        index.add(session.get('tool_sequence', []))
+    return index
+
+
+def analyze_workflow_patterns(sessions: List[Dict[str, Any]], index: NGramIndex = None) -> str:
     """워크플로우 패턴 분석 (3-gram) - 가장 빈번한 패턴 1개 반환"""
-    patterns = Counter()
+    if index is None:
+        index = build_workflow_index(sessions, max_len=3)
+    top = index.top(1, min_len=3, max_len=3)
+    if top:
+        return ' → '.join(top[0][0])
+    return ""
+
+
+def count_patterns_before_errors(sessions: List[Dict[str, Any]], error_window: int = 4) -> Counter:
+    """실패한 호출로 끝나는 길이 2..error_window 도구 시퀀스 윈도우의 출현 횟수"""
+    before_errors = Counter()
     for session in sessions:
         seq = session.get('tool_sequence', [])
-        for i in range(len(seq) - 2):
-            pattern = ' → '.join(seq[i:i + 3])
-            patterns[pattern] += 1
+        for i, call in enumerate(get_tool_graph(session)['calls']):
+            if call['failed']:
+                for length in range(2, min(error_window, i + 1) + 1):
+                    before_errors[tuple(seq[i - length + 1:i + 1])] += 1
+    return before_errors
 
-    if patterns:
-        top_pattern, count = patterns.most_common(1)[0]
-        return top_pattern
-    return ""
+
+def mine_workflow_patterns(sessions: List[Dict[str, Any]], index: NGramIndex = None,
+                           top_k: int = 10, error_window: int = 4) -> Dict[str, Any]:
+    """길이 2-8의 빈발 워크플로우 패턴과 도구 에러 직전의 전형적 패턴"""
+    if index is None:
+        index = build_workflow_index(sessions)
+    before_errors = count_patterns_before_errors(sessions, error_window)
+
+    return {
+        'top_patterns': [
+            {'pattern': ' → '.join(pattern), 'length': len(pattern), 'count': count}
+            for pattern, count in index.top(top_k, min_len=2, closed=True)
+        ],
+        'before_errors': [
+            {'pattern': ' → '.join(pattern), 'count': count}
+            for pattern, count in before_errors.most_common(5)
+        ],
+    }
+
+
+class QuantileSketch:
+    """병합 가능한 로그 버킷 분위수 스케치 (DDSketch 방식, 상대 오차 alpha)
+
+    값마다 ceil(log_gamma(v)) 버킷의 개수만 세므로 메모리는 값의 범위에만 비례하고,
+    세션/날짜/루트별 스케치를 merge()로 합쳐도 같은 정확도를 유지함.
+    """
+
+    MIN_VALUE = 1e-3
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if value < self.MIN_VALUE:
+            self.zero_count += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self._log_gamma)] += 1
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        cumulative = self.zero_count
+        if rank < cumulative:
+            return 0.0
+        for key in sorted(self.buckets):
+            cumulative += self.buckets[key]
+            if cumulative > rank:
+                return min(2 * self.gamma ** key / (self.gamma + 1), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'alpha': self.alpha, 'buckets': {str(k): v for k, v in self.buckets.items()},
+                'zero_count': self.zero_count, 'count': self.count, 'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(d.get('alpha', 0.01))
+        sketch.buckets = Counter({int(k): v for k, v in d.get('buckets', {}).items()})
+        sketch.zero_count = d.get('zero_count', 0)
+        sketch.count = d.get('count', 0)
+        sketch.total = d.get('total', 0.0)
+        sketch.max = d.get('max', 0.0)
+        return sketch
+
+
+def summarize_sketch(sketch: QuantileSketch) -> Dict[str, Any]:
+    """스케치를 리포트용 분포 요약(count/p50/p95/p99/max/total)으로 변환"""
+    return {
+        'count': sketch.count,
+        'p50': round(sketch.quantile(0.50), 2),
+        'p95': round(sketch.quantile(0.95), 2),
+        'p99': round(sketch.quantile(0.99), 2),
+        'max': round(sketch.max, 2),
+        'total': round(sketch.total, 2),
+    }
+
+
+def _seconds_between(start_ts: str, end_ts: str) -> Optional[float]:
+    """두 ISO 타임스탬프 사이 초 (파싱 실패/역순이면 None)"""
+    if not start_ts or not end_ts:
+        return None
+    start, end = parse_timestamp(start_ts), parse_timestamp(end_ts)
+    if start is None or end is None:
+        return None
+    try:
+        seconds = (end - start).total_seconds()
+    except TypeError:
+        # naive/aware 혼재
+        return None
+    return seconds if seconds >= 0 else None
+
+
+def _tool_target(tool_use: Dict[str, Any]) -> str:
+    """도구 호출 대상 요약 (명령어/파일 경로/패턴 등, 80자)"""
+    tool_input = tool_use.get('input') or {}
+    if not isinstance(tool_input, dict):
+        return ''
+    for key in ('command', 'file_path', 'pattern', 'url', 'skill', 'description', 'path'):
+        value = tool_input.get(key)
+        if value:
+            return str(value)[:80]
+    return ''
+
+
+def session_tool_latencies(session: Dict[str, Any]) -> List[Tuple[Dict[str, Any], float]]:
+    """tool_use와 tool_use_id로 매칭된 tool_result의 타임스탬프 차이 (도구 호출, 초) 목록"""
+    tool_results = session.get('tool_results', [])
+    latencies = []
+    for tu, call in zip(session.get('tool_uses', []), get_tool_graph(session)['calls']):
+        if call['result'] is None:
+            continue
+        seconds = _seconds_between(tu.get('timestamp'), tool_results[call['result']].get('timestamp'))
+        if seconds is not None:
+            latencies.append((tu, seconds))
+    return latencies
+
+
+def analyze_tool_latency(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """도구별 실행 시간 분포(p50/p95/p99/합계, 초)와 가장 느린 호출"""
+    sketches = {}
+    slowest = []
+    for session in sessions:
+        session_sketches = {}
+        for tu, seconds in session_tool_latencies(session):
+            session_sketches.setdefault(tu['name'], QuantileSketch()).add(seconds)
+            slowest.append((seconds, tu, session.get('session_id', '')))
+        for name, sketch in session_sketches.items():
+            sketches.setdefault(name, QuantileSketch()).merge(sketch)
+        slowest = heapq.nlargest(top_n, slowest, key=lambda x: x[0])
+
+    by_tool = [
+        {'name': name, **summarize_sketch(sketch)}
+        for name, sketch in sorted(sketches.items(), key=lambda x: x[1].total, reverse=True)
+    ]
+    return {
+        'unit': 'seconds',
+        'by_tool': by_tool,
+        'slowest': [
+            {'name': tu['name'], 'seconds': round(seconds, 2), 'target': _tool_target(tu), 'session': sid}
+            for seconds, tu, sid in slowest
+        ],
+    }
+
+
+def _sum_usage(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """usage 레코드 합계와 캐시 적중률 (cache_read / 전체 입력)"""
+    totals = {field: sum(r.get(field, 0) for r in records) for field in TOKEN_USAGE_FIELDS}
+    prompt_tokens = (totals['input_tokens'] + totals['cache_creation_input_tokens']
+                     + totals['cache_read_input_tokens'])
+    totals['total_tokens'] = prompt_tokens + totals['output_tokens']
+    totals['cache_hit_ratio'] = round(totals['cache_read_input_tokens'] / prompt_tokens, 3) if prompt_tokens else 0
+    return totals
+
+
+def analyze_token_usage(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """토큰 사용량/프롬프트 캐시 효율 집계 (전체, 모델별, 일자별, 세션별)"""
+    all_records = []
+    by_model = {}
+    by_day = {}
+    session_rows = []
+    for session in sessions:
+        records = session.get('usage_records', [])
+        all_records.extend(records)
+        for r in records:
+            by_model.setdefault(r.get('model') or 'unknown', []).append(r)
+            day = (r.get('timestamp') or '')[:10]
+            if day:
+                by_day.setdefault(day, []).append(r)
+        if records:
+            row = _sum_usage(records)
+            tool_calls = len(session.get('tool_uses', []))
+            row['session'] = session.get('session_id', '')
+            row['tokens_per_tool_call'] = round(row['total_tokens'] / tool_calls) if tool_calls else 0
+            session_rows.append(row)
+
+    totals = _sum_usage(all_records)
+    tool_calls = sum(len(s.get('tool_uses', [])) for s in sessions)
+    edited_files = sum(len(s.get('edit_write_files', {})) for s in sessions)
+    n = len(sessions) or 1
+    return {
+        'totals': totals,
+        'avg_tokens_per_session': round(totals['total_tokens'] / n),
+        'tokens_per_tool_call': round(totals['total_tokens'] / tool_calls) if tool_calls else 0,
+        'tokens_per_edited_file': round(totals['total_tokens'] / edited_files) if edited_files else 0,
+        'by_model': {model: _sum_usage(records) for model, records in sorted(by_model.items())},
+        'by_day': {day: _sum_usage(records) for day, records in sorted(by_day.items())},
+        'top_sessions': sorted(session_rows, key=lambda r: r['total_tokens'], reverse=True)[:top_n],
+    }
+
+
+def analyze_by_model(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """모델별 응답 메시지/도구 호출/에러율/토큰/턴 응답 시간 — 세션을 한 번만 순회하며 모델 단위로 집계"""
+    stats = {}
+
+    def model_stats(model):
+        if model not in stats:
+            stats[model] = {
+                'sessions': set(), 'messages': 0, 'tool_calls': 0, 'results': 0, 'errors': 0,
+                'usage': [], 'turns': QuantileSketch(),
+            }
+        return stats[model]
+
+    for session in sessions:
+        sid = session.get('session_id', '')
+        for model, count in session.get('model_messages', {}).items():
+            entry = model_stats(model)
+            entry['messages'] += count
+            entry['sessions'].add(sid)
+        for r in session.get('usage_records', []):
+            model_stats(r.get('model') or 'unknown')['usage'].append(r)
+        for tu, call in zip(session.get('tool_uses', []), get_tool_graph(session)['calls']):
+            entry = model_stats(tu.get('model') or 'unknown')
+            entry['tool_calls'] += 1
+            if call['result'] is not None:
+                entry['results'] += 1
+                entry['errors'] += call['failed']
+        for turn in session.get('turns', []):
+            seconds = _seconds_between(turn.get('start'), turn.get('end'))
+            if seconds is not None:
+                model_stats(turn.get('model') or 'unknown')['turns'].add(seconds)
+
+    by_model = {}
+    for model, entry in sorted(stats.items()):
+        tokens = _sum_usage(entry['usage'])
+        turn_seconds = entry['turns'].total
+        by_model[model] = {
+            'sessions': len(entry['sessions']),
+            'messages': entry['messages'],
+            'tool_calls': entry['tool_calls'],
+            'tool_errors': entry['errors'],
+            'error_rate': round(entry['errors'] / entry['results'] * 100, 1) if entry['results'] else 0,
+            'tokens': tokens,
+            'tokens_per_tool_call': round(tokens['total_tokens'] / entry['tool_calls']) if entry['tool_calls'] else 0,
+            'turn_latency': summarize_sketch(entry['turns']),
+            # 처리량: 턴 응답 시간 1초당 출력 토큰
+            'output_tokens_per_second': round(tokens['output_tokens'] / turn_seconds, 1) if turn_seconds else 0,
+        }
+    return by_model
+
+
+def analyze_turn_timing(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """턴 응답 시간(프롬프트→마지막 assistant 메시지), 턴 사이 유휴 시간, 세션 활성/경과 시간 분포"""
+    turn_sketch = QuantileSketch()
+    idle_sketch = QuantileSketch()
+    active_sketch = QuantileSketch()
+    wall_sketch = QuantileSketch()
+    slowest = []
+
+    for session in sessions:
+        turns = session.get('turns', [])
+        active = 0.0
+        for i, turn in enumerate(turns):
+            seconds = _seconds_between(turn.get('start'), turn.get('end'))
+            if seconds is not None:
+                turn_sketch.add(seconds)
+                active += seconds
+                slowest.append((seconds, session.get('session_id', ''), turn))
+            if i + 1 < len(turns):
+                idle = _seconds_between(turn.get('end'), turns[i + 1].get('start'))
+                if idle is not None:
+                    idle_sketch.add(idle)
+        wall = _seconds_between(session.get('first_timestamp'), session.get('last_timestamp'))
+        if wall is not None:
+            wall_sketch.add(wall)
+            active_sketch.add(active)
+        slowest = heapq.nlargest(top_n, slowest, key=lambda x: x[0])
+
+    return {
+        'unit': 'seconds',
+        'turn_latency': summarize_sketch(turn_sketch),
+        'idle_gaps': summarize_sketch(idle_sketch),
+        'session_duration': {
+            'active': summarize_sketch(active_sketch),
+            'wall_clock': summarize_sketch(wall_sketch),
+            'active_ratio': round(active_sketch.total / wall_sketch.total, 3) if wall_sketch.total else 0,
+        },
+        'slowest_turns': [
+            {'session': sid, 'start': turn.get('start'), 'seconds': round(seconds, 2), 'prompt': turn.get('prompt', '')}
+            for seconds, sid, turn in slowest
+        ],
+    }
+
+
+def _context_size(record: Dict[str, Any]) -> int:
+    """usage 레코드의 프롬프트 토큰 합 = 해당 시점 컨텍스트 크기"""
+    return (record.get('input_tokens', 0) + record.get('cache_creation_input_tokens', 0)
+            + record.get('cache_read_input_tokens', 0))
+
+
+def _downsample_max(values: List[int], points: int = 20) -> List[int]:
+    """곡선을 구간별 최댓값으로 points개 이하로 축약"""
+    if len(values) <= points:
+        return list(values)
+    size = len(values) / points
+    return [max(values[int(i * size):int((i + 1) * size)]) for i in range(points)]
+
+
+def analyze_context_growth(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """assistant 응답별 컨텍스트 크기 추이, 최대 컨텍스트, 한계 근접 빈도, 압축(compaction) 이벤트"""
+    near_limit = CONTEXT_WINDOW_TOKENS * CONTEXT_NEAR_LIMIT_RATIO
+    peak_sketch = QuantileSketch()
+    triggers = Counter()
+    sessions_near_limit = 0
+    rows = []
+
+    for session in sessions:
+        sizes = [_context_size(r) for r in session.get('usage_records', [])]
+        if not sizes:
+            continue
+        events = session.get('compactions', [])
+        for event in events:
+            triggers[event.get('trigger', 'manual')] += 1
+        if not events:
+            # compact_boundary 기록이 없는 로그: 컨텍스트가 절반 이하로 급감한 지점을 자동 압축으로 추정
+            for prev, curr in zip(sizes, sizes[1:]):
+                if prev >= near_limit / 2 and curr < prev / 2:
+                    triggers['inferred'] += 1
+
+        peak = max(sizes)
+        peak_sketch.add(peak)
+        turns_near_limit = sum(1 for size in sizes if size >= near_limit)
+        if turns_near_limit:
+            sessions_near_limit += 1
+        rows.append({
+            'session': session.get('session_id', ''),
+            'peak_context': peak,
+            'turns_near_limit': turns_near_limit,
+            'compactions': len(events),
+            'curve': _downsample_max(sizes),
+        })
+
+    peak_summary = summarize_sketch(peak_sketch)
+    peak_summary.pop('total')
+    return {
+        'context_window': CONTEXT_WINDOW_TOKENS,
+        'near_limit_tokens': int(near_limit),
+        'peak_context': {key: int(value) for key, value in peak_summary.items()},
+        'sessions_near_limit': sessions_near_limit,
+        'near_limit_ratio': round(sessions_near_limit / len(rows), 3) if rows else 0,
+        'compactions': {
+            'manual': triggers.get('manual', 0),
+            'auto': triggers.get('auto', 0),
+            'inferred': triggers.get('inferred', 0),
+        },
+        'sessions': sorted(rows, key=lambda r: r['peak_context'], reverse=True)[:top_n],
+    }
+
+
+def analyze_tool_output_sizes(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """도구별 결과 크기(바이트/줄) 분포와 가장 큰 결과 — 컨텍스트를 많이 차지하는 도구 파악용"""
+    byte_sketches = {}
+    line_sketches = {}
+    largest = []
+    for session in sessions:
+        tool_results = session.get('tool_results', [])
+        for tu, call in zip(session.get('tool_uses', []), get_tool_graph(session)['calls']):
+            if call['result'] is None:
+                continue
+            result = tool_results[call['result']]
+            size = result.get('bytes', 0)
+            byte_sketches.setdefault(tu['name'], QuantileSketch()).add(size)
+            line_sketches.setdefault(tu['name'], QuantileSketch()).add(result.get('lines', 0))
+            largest.append((size, result.get('lines', 0), tu, session.get('session_id', '')))
+        largest = heapq.nlargest(top_n, largest, key=lambda x: x[0])
+
+    total_bytes = sum(sketch.total for sketch in byte_sketches.values())
+    by_tool = []
+    for name, sketch in sorted(byte_sketches.items(), key=lambda x: x[1].total, reverse=True):
+        bytes_summary = {key: int(value) for key, value in summarize_sketch(sketch).items()}
+        lines_summary = summarize_sketch(line_sketches[name])
+        by_tool.append({
+            'name': name,
+            'count': bytes_summary.pop('count'),
+            'bytes': bytes_summary,
+            'lines': {key: int(lines_summary[key]) for key in ('p50', 'p95', 'max', 'total')},
+            'share': round(sketch.total / total_bytes * 100, 1) if total_bytes else 0,
+        })
+    return {
+        'total_bytes': int(total_bytes),
+        'by_tool': by_tool,
+        'largest': [
+            {'name': tu['name'], 'bytes': size, 'lines': lines, 'target': _tool_target(tu), 'session': sid}
+            for size, lines, tu, sid in largest
+        ],
+    }
+
+
+# 파일 내용을 바꾸는 도구 (중복 호출 판정 초기화 기준)
+MUTATING_TOOLS = ('Edit', 'Write', 'MultiEdit', 'NotebookEdit')
+
+
+def _redundancy_key(tool_use: Dict[str, Any]) -> Optional[tuple]:
+    """(도구 이름, 정규화된 입력) 키. 중복 판정 대상(Read/Bash/Grep/Glob)이 아니면 None"""
+    name = tool_use.get('name', '')
+    tool_input = tool_use.get('input') or {}
+    if not isinstance(tool_input, dict):
+        return None
+    if name == 'Read':
+        normalized = (tool_input.get('file_path', ''), tool_input.get('offset'), tool_input.get('limit'))
+    elif name == 'Bash':
+        normalized = ' '.join(str(tool_input.get('command', '')).split())
+    elif name in ('Grep', 'Glob'):
+        normalized = json.dumps(tool_input, sort_keys=True, ensure_ascii=False)
+    else:
+        return None
+    return name, normalized
+
+
+def find_redundant_calls(session: Dict[str, Any]) -> List[int]:
+    """중간에 파일 변경 없이 같은 입력으로 반복된 Read/Bash/Grep/Glob 호출의 tool_uses 인덱스
+
+    Read는 같은 파일의 Edit/Write 때만, Bash/Grep/Glob 결과는 어떤 파일 변경으로도 달라질 수
+    있으므로 모든 Edit/Write 때 초기화. 직전 동일 호출이 실패했다면 재시도로 보고 제외.
+    """
+    calls = get_tool_graph(session)['calls']
+    seen = {}
+    read_keys_by_file = {}
+    other_keys = set()
+    redundant = []
+    for i, tu in enumerate(session.get('tool_uses', [])):
+        name = tu.get('name', '')
+        if name in MUTATING_TOOLS:
+            tool_input = tu.get('input') or {}
+            # NotebookEdit는 file_path 대신 notebook_path를 사용
+            fp = tool_input.get('file_path') or tool_input.get('notebook_path', '')
+            for key in read_keys_by_file.pop(fp, ()):
+                seen.pop(key, None)
+            for key in other_keys:
+                seen.pop(key, None)
+            other_keys.clear()
+            continue
+        key = _redundancy_key(tu)
+        if key is None:
+            continue
+        if key in seen and not calls[seen[key]]['failed']:
+            redundant.append(i)
+            continue
+        seen[key] = i
+        if name == 'Read':
+            read_keys_by_file.setdefault(tu['input'].get('file_path', ''), set()).add(key)
+        else:
+            other_keys.add(key)
+    return redundant
+
+
+def _offender_rows(offenders: Counter, offender_bytes: Counter, top_n: int) -> List[Dict[str, Any]]:
+    return [
+        {'session': sid, 'name': name, 'target': target, 'count': count,
+         'bytes': offender_bytes[(sid, name, target)]}
+        for (sid, name, target), count in offenders.most_common(top_n)
+    ]
+
+
+def analyze_redundant_calls(sessions: List[Dict[str, Any]], top_n: int = 10, day_top_n: int = 5) -> Dict[str, Any]:
+    """반복 Read/동일 명령 재실행 등 중복 도구 호출 수와 낭비된 결과 바이트, 세션/일자별 상위 항목"""
+    by_tool = {}
+    by_day = {}
+    offenders = Counter()
+    offender_bytes = Counter()
+    day_offenders = {}
+    day_offender_bytes = {}
+    session_rows = []
+    total_calls = 0
+    total_redundant = 0
+    total_bytes = 0
+
+    for session in sessions:
+        tool_uses = session.get('tool_uses', [])
+        tool_results = session.get('tool_results', [])
+        calls = get_tool_graph(session)['calls']
+        total_calls += len(tool_uses)
+        session_redundant = 0
+        session_bytes = 0
+        for i in find_redundant_calls(session):
+            tu = tool_uses[i]
+            result = calls[i]['result']
+            size = tool_results[result].get('bytes', 0) if result is not None else 0
+            stats = by_tool.setdefault(tu['name'], {'count': 0, 'bytes': 0})
+            stats['count'] += 1
+            stats['bytes'] += size
+            day = (tu.get('timestamp') or '')[:10]
+            if day:
+                day_stats = by_day.setdefault(day, {'count': 0, 'bytes': 0})
+                day_stats['count'] += 1
+                day_stats['bytes'] += size
+            offender = (session.get('session_id', ''), tu['name'], _tool_target(tu))
+            offenders[offender] += 1
+            offender_bytes[offender] += size
+            if day:
+                day_offenders.setdefault(day, Counter())[offender] += 1
+                day_offender_bytes.setdefault(day, Counter())[offender] += size
+            session_redundant += 1
+            session_bytes += size
+        if session_redundant:
+            session_rows.append({'session': session.get('session_id', ''), 'count': session_redundant,
+                                 'bytes': session_bytes})
+        total_redundant += session_redundant
+        total_bytes += session_bytes
+
+    return {
+        'total': total_redundant,
+        'ratio': round(total_redundant / total_calls * 100, 1) if total_calls else 0,
+        'wasted_result_bytes': total_bytes,
+        'by_tool': dict(sorted(by_tool.items(), key=lambda x: x[1]['count'], reverse=True)),
+        'by_day': dict(sorted(by_day.items())),
+        'by_session': sorted(session_rows, key=lambda r: (r['count'], r['bytes']), reverse=True)[:top_n],
+        'top_offenders': _offender_rows(offenders, offender_bytes, top_n),
+        'top_offenders_by_day': {
+            day: _offender_rows(day_offenders[day], day_offender_bytes[day], day_top_n)
+            for day in sorted(day_offenders)
+        },
+    }
+
+
+# 서로 독립적으로 한 번에 묶어 호출할 수 있는 읽기 전용 도구
+BATCHABLE_TOOLS = ('Read', 'Grep', 'Glob')
+
+
+def _tool_batches(session: Dict[str, Any]) -> List[List[str]]:
+    """tool_uses를 응답 단위 배치(도구 이름 목록)로 묶음"""
+    batches = []
+    last = None
+    for tu in session.get('tool_uses', []):
+        batch = tu.get('batch')
+        if batch is None or batch != last:
+            batches.append([])
+            last = batch
+        batches[-1].append(tu.get('name', ''))
+    return batches
+
+
+def analyze_parallel_calls(sessions: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """한 응답에서 여러 도구를 동시에 호출한 비율, 평균 배치 크기, 놓친 병렬화 기회
+
+    놓친 기회: 단독 Read/Grep/Glob 호출 배치가 2번 이상 연달아 이어진 구간
+    (한 번에 묶었다면 줄일 수 있었던 왕복 수 = 구간 길이 - 1).
+    """
+    size_dist = Counter()
+    tool_calls = Counter()
+    tool_parallel = Counter()
+    missed_runs = 0
+    missed_round_trips = 0
+    session_rows = []
+
+    for session in sessions:
+        session_missed = 0
+        run = 0
+        for batch in _tool_batches(session) + [[]]:
+            if batch:
+                size_dist[len(batch)] += 1
+                for name in batch:
+                    tool_calls[name] += 1
+                    if len(batch) > 1:
+                        tool_parallel[name] += 1
+            if len(batch) == 1 and batch[0] in BATCHABLE_TOOLS:
+                run += 1
+                continue
+            if run >= 2:
+                missed_runs += 1
+                missed_round_trips += run - 1
+                session_missed += run - 1
+            run = 0
+        if session_missed:
+            session_rows.append({'session': session.get('session_id', ''), 'missed_round_trips': session_missed})
+
+    total_calls = sum(tool_calls.values())
+    total_batches = sum(size_dist.values())
+    parallel_calls = sum(tool_parallel.values())
+    return {
+        'total_calls': total_calls,
+        'batches': total_batches,
+        'parallel_calls': parallel_calls,
+        'parallel_share': round(parallel_calls / total_calls * 100, 1) if total_calls else 0,
+        'avg_batch_size': round(total_calls / total_batches, 2) if total_batches else 0,
+        'batch_size_distribution': {str(size): count for size, count in sorted(size_dist.items())},
+        'parallel_share_by_tool': {
+            name: round(tool_parallel[name] / count * 100, 1) for name, count in tool_calls.most_common()
+        },
+        'missed_opportunities': {
+            'runs': missed_runs,
+            'round_trips': missed_round_trips,
+            'top_sessions': sorted(session_rows, key=lambda r: r['missed_round_trips'], reverse=True)[:top_n],
+        },
+    }
+
+
+# ============================================================================
+# Section 3.4: Message Feature Columns (메시지 특징 열)
+# ============================================================================
+
+# style 열의 코드 → analyze_prompt_style 결과
+PROMPT_STYLES = ('command_style', 'descriptive_style', 'plan_based_style')
+_PROMPT_STYLE_CODES = {style: code for code, style in enumerate(PROMPT_STYLES)}
+
+
+def session_message_features(session: Dict[str, Any]) -> Dict[str, Any]:
+    """세션 사용자 메시지별 특징(길이, 단어 수, 스타일 코드, 수정/완료 키워드, 주제 전환, 위치)
+
+    세션 dict에는 저장하지 않음 (세션마다 메시지 수만큼 리스트가 남으므로). 분석 한 번에 MessageFeatures를
+    한 번만 만들어 여러 분석 함수에 넘기는 방식으로 정규식/키워드 검사 중복을 피함.
+    """
+    msgs = session.get('user_messages', [])
+    count = len(msgs)
+    # 완료 키워드는 세션 마지막 30% 메시지에서만 확인 (calc_efficiency_score)
+    tail_start = max(0, count - max(1, count * 30 // 100))
+    features = {
+        'length': [], 'words': [], 'style': [], 'correction': [], 'completion': [],
+        'topic_switch': [], 'first': [], 'tail': [], 'context_points': None,
+    }
+    prev_words = None
+    for i, msg in enumerate(msgs):
+        lowered = msg.lower()
+        words = set(lowered.split())
+        topic_switch = False
+        if prev_words and words:
+            overlap = len(prev_words & words) / max(len(prev_words), len(words))
+            topic_switch = overlap < 0.08 and len(prev_words) > 3 and len(words) > 3
+        prev_words = words
+        features['length'].append(len(msg))
+        features['words'].append(len(msg.split()))
+        features['style'].append(_PROMPT_STYLE_CODES[analyze_prompt_style(msg)])
+        features['correction'].append(any(kw in lowered for kw in CORRECTION_KEYWORDS))
+        features['completion'].append(any(kw in lowered for kw in COMPLETION_KEYWORDS))
+        features['topic_switch'].append(topic_switch)
+        features['first'].append(i == 0)
+        features['tail'].append(i >= tail_start)
+
+    if msgs:
+        # 첫 요청의 맥락 제공 수준 (calc_intent_score)
+        first_msg = msgs[0]
+        has_specifics = any(re.search(p, first_msg, re.IGNORECASE) for p in SPECIFICS_PATTERNS)
+        if len(first_msg) >= 50 and has_specifics:
+            features['context_points'] = 5
+        elif len(first_msg) >= 30 or has_specifics:
+            features['context_points'] = 3
+        else:
+            features['context_points'] = 1
+
+    return features
+
+
+class MessageFeatures:
+    """세션 목록의 사용자 메시지 특징을 열(column) 단위로 모은 표
+
+    분석 한 번에 한 번만 만들어 프롬프트 통계·사용 스타일·점수·샘플링 추정이 공유.
+    """
+
+    COLUMNS = ('length', 'words', 'style', 'correction', 'completion', 'topic_switch', 'first', 'tail')
+
+    def __init__(self, sessions: List[Dict[str, Any]]):
+        columns = {name: [] for name in self.COLUMNS}
+        session_index = []
+        self.context_points = []
+        for index, session in enumerate(sessions):
+            features = session_message_features(session)
+            for name in self.COLUMNS:
+                columns[name].extend(features[name])
+            session_index.extend([index] * len(features['length']))
+            if features['context_points'] is not None:
+                self.context_points.append(features['context_points'])
+        columns['session'] = session_index
+        self.sessions = len(sessions)
+        self.size = len(session_index)
+        self.columns = columns
+
+    def total(self, name: str) -> int:
+        """수치 열의 합"""
+        return sum(self.columns[name])
+
+    def extent(self, name: str) -> Tuple[int, int]:
+        """수치 열의 (최솟값, 최댓값)"""
+        column = self.columns[name]
+        return min(column), max(column)
+
+    def count(self, name: str, followups_only: bool = False) -> int:
+        """플래그 열이 참인 메시지 수 (followups_only면 세션 첫 메시지 제외)"""
+        column, first = self.columns[name], self.columns['first']
+        if followups_only:
+            return sum(1 for flag, is_first in zip(column, first) if flag and not is_first)
+        return sum(1 for flag in column if flag)
+
+    def any_tail_completion(self) -> bool:
+        """세션 마지막 30% 메시지 중 완료 키워드가 있는지"""
+        completion, tail = self.columns['completion'], self.columns['tail']
+        return any(flag and in_tail for flag, in_tail in zip(completion, tail))
+
+    def length_classes(self) -> Counter:
+        """classify_prompt_length 기준 short/medium/long 분포"""
+        return Counter(classify_prompt_length(length) for length in self.columns['length'])
+
+    def style_counts(self) -> Dict[str, int]:
+        """프롬프트 스타일별 메시지 수"""
+        counts = [0] * len(PROMPT_STYLES)
+        for code in self.columns['style']:
+            counts[code] += 1
+        return dict(zip(PROMPT_STYLES, counts))
+
+    def per_session(self, name: str = None, followups_only: bool = False) -> List[int]:
+        """세션별 메시지 수 (name을 주면 해당 플래그가 참인 메시지 수)"""
+        counts = [0] * self.sessions
+        flags = self.columns[name] if name is not None else [True] * self.size
+        for index, flag, is_first in zip(self.columns['session'], flags, self.columns['first']):
+            if flag and not (followups_only and is_first):
+                counts[index] += 1
+        return counts
+
+    def per_session_styles(self) -> Dict[str, List[int]]:
+        """스타일별 세션당 메시지 수"""
+        counts = {style: [0] * self.sessions for style in PROMPT_STYLES}
+        for index, code in zip(self.columns['session'], self.columns['style']):
+            counts[PROMPT_STYLES[code]][index] += 1
+        return counts
 
 
 # ============================================================================
@@ -880,13 +2469,12 @@ def analyze_prompt_style(message: str) -> str:
     return 'descriptive_style'
 
 
-def analyze_prompt_statistics(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """프롬프트 길이 및 스타일 통계 분석"""
-    all_messages = []
-    for session in sessions:
-        all_messages.extend(session.get('user_messages', []))
+def analyze_prompt_statistics(sessions: List[Dict[str, Any]],
+                              features: 'MessageFeatures' = None) -> Dict[str, Any]:
+    """프롬프트 길이 및 스타일 통계 분석 (features는 같은 sessions로 만든 표, 없으면 새로 만듦)"""
+    table = features or MessageFeatures(sessions)
 
-    if not all_messages:
+    if not table.size:
         return {
             'total_prompts': 0,
             'avg_length': 0,
@@ -904,20 +2492,20 @@ def analyze_prompt_statistics(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
             }
         }
 
-    lengths = [len(msg) for msg in all_messages]
-    total = len(all_messages)
+    total = table.size
+    min_length, max_length = table.extent('length')
 
     # 길이 분포
-    length_dist = Counter(classify_prompt_length(l) for l in lengths)
+    length_dist = table.length_classes()
 
     # 스타일 분석
-    style_dist = Counter(analyze_prompt_style(msg) for msg in all_messages)
+    style_dist = table.style_counts()
 
     return {
         'total_prompts': total,
-        'avg_length': round(sum(lengths) / total, 1),
-        'max_length': max(lengths),
-        'min_length': min(lengths),
+        'avg_length': round(table.total('length') / total, 1),
+        'max_length': max_length,
+        'min_length': min_length,
         'length_distribution': {
             'short': {
                 'count': length_dist.get('short', 0),
@@ -976,6 +2564,8 @@ def analyze_error_patterns(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
                 'immediate_fix': 0,
                 'retry_same': 0,
                 'alternative_approach': 0,
+                'recovered': 0,
+                'retry_loops': 0,
             },
             'frequent_errors': []
         }
@@ -990,28 +2580,10 @@ def analyze_error_patterns(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
         if content:
             error_messages.append(content[:100])
 
-    # 에러 복구 패턴 분석
-    recovery_patterns = {'immediate_fix': 0, 'retry_same': 0, 'alternative_approach': 0}
-
+    # 에러 복구 패턴 분석 (세션 도구 호출 그래프 기반)
+    recovery_patterns = Counter()
     for session in sessions:
-        tool_uses = session.get('tool_uses', [])
-        tool_results = session.get('tool_results', [])
-        failed_ids = {tr['tool_use_id'] for tr in tool_results if tr.get('is_error')}
-
-        for i, tu in enumerate(tool_uses):
-            if tu.get('id') in failed_ids:
-                # 다음 도구 호출 확인
-                if i + 1 < len(tool_uses):
-                    next_tu = tool_uses[i + 1]
-                    if next_tu.get('name') == tu.get('name'):
-                        # 같은 도구 재시도
-                        recovery_patterns['retry_same'] += 1
-                    else:
-                        # 다른 도구로 전환
-                        recovery_patterns['alternative_approach'] += 1
-                else:
-                    # 즉시 수정 (세션 끝에서 에러 후 종료)
-                    recovery_patterns['immediate_fix'] += 1
+        recovery_patterns.update(summarize_tool_graph(get_tool_graph(session)))
 
     # 자주 발생하는 에러 패턴 추출
     error_pattern_counter = Counter()
@@ -1033,7 +2605,10 @@ def analyze_error_patterns(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
         'total_errors': total_errors,
         'error_rate': round(total_errors / total_results * 100, 1) if total_results > 0 else 0,
         'error_types': dict(error_types),
-        'recovery_patterns': recovery_patterns,
+        'recovery_patterns': {
+            key: recovery_patterns.get(key, 0)
+            for key in ('immediate_fix', 'retry_same', 'alternative_approach', 'recovered', 'retry_loops')
+        },
         'frequent_errors': frequent_errors
     }
 
@@ -1049,8 +2624,8 @@ def classify_session_scale(session: Dict[str, Any]) -> str:
         return 'small'
 
 
-def analyze_usage_style(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """사용 스타일 종합 분석"""
+def analyze_usage_style(sessions: List[Dict[str, Any]], features: 'MessageFeatures' = None) -> Dict[str, Any]:
+    """사용 스타일 종합 분석 (features는 같은 sessions로 만든 표, 없으면 새로 만듦)"""
     if not sessions:
         return {
             'session_scale': {},
@@ -1075,17 +2650,10 @@ def analyze_usage_style(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
                 'description': descriptions.get(scale, '')
             }
 
-    # 수정 요청 빈도 분석
-    initial_requests = 0
-    follow_up_corrections = 0
-
-    for session in sessions:
-        msgs = session.get('user_messages', [])
-        if msgs:
-            initial_requests += 1  # 첫 요청
-            for msg in msgs[1:]:  # 이후 메시지
-                if any(kw in msg.lower() for kw in CORRECTION_KEYWORDS):
-                    follow_up_corrections += 1
+    # 수정 요청 빈도 분석 (첫 요청 수, 이후 메시지 중 수정 요청 수)
+    table = features or MessageFeatures(sessions)
+    initial_requests = table.count('first')
+    follow_up_corrections = table.count('correction', followups_only=True)
 
     correction_ratio = round(follow_up_corrections / initial_requests, 2) if initial_requests > 0 else 0
 
@@ -1093,12 +2661,8 @@ def analyze_usage_style(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
     strengths = []
 
     # 1. 계획 기반 요청 비율이 높은지
-    plan_based_count = sum(
-        1 for s in sessions
-        for msg in s.get('user_messages', [])
-        if analyze_prompt_style(msg) == 'plan_based_style'
-    )
-    total_msgs = sum(len(s.get('user_messages', [])) for s in sessions)
+    plan_based_count = table.style_counts()['plan_based_style']
+    total_msgs = table.size
     if total_msgs > 0 and plan_based_count / total_msgs > 0.3:
         strengths.append("사전 계획 제공으로 명확한 기대치 설정")
 
@@ -1148,11 +2712,7 @@ def analyze_usage_style(sessions: List[Dict[str, Any]]) -> Dict[str, Any]:
         improvements.append(f"후속 수정 요청이 많음 ({correction_ratio}배)")
 
     # 3. 긴 프롬프트 비율이 높은 경우
-    long_prompt_count = sum(
-        1 for s in sessions
-        for msg in s.get('user_messages', [])
-        if len(msg) > 500
-    )
+    long_prompt_count = table.length_classes()['long']
     if total_msgs > 0 and long_prompt_count / total_msgs > 0.4:
         improvements.append("긴 계획서 제공 시 토큰 소모가 클 수 있음")
 
@@ -1217,17 +2777,13 @@ def classify_complexity(sessions: List[Dict]) -> str:
         return '경량'
 
 
-def calc_intent_score(sessions: List[Dict]) -> Tuple[int, Dict]:
+def calc_intent_score(sessions: List[Dict], features: 'MessageFeatures' = None) -> Tuple[int, Dict]:
     """의도 전달력 (25점)"""
     details = {}
 
-    total_user_msgs = 0
-    correction_msgs = 0
-    for s in sessions:
-        for msg in s['user_messages']:
-            total_user_msgs += 1
-            if any(kw in msg.lower() for kw in CORRECTION_KEYWORDS):
-                correction_msgs += 1
+    table = features or MessageFeatures(sessions)
+    total_user_msgs = table.size
+    correction_msgs = table.count('correction')
 
     ratio = correction_msgs / total_user_msgs if total_user_msgs > 0 else 0
     if ratio <= 0.10:
@@ -1240,32 +2796,14 @@ def calc_intent_score(sessions: List[Dict]) -> Tuple[int, Dict]:
     details['correction_ratio'] = round(ratio * 100, 1)
     details['correction_score'] = correction_score
 
-    context_scores = []
-    for s in sessions:
-        if s['user_messages']:
-            first_msg = s['user_messages'][0]
-            length = len(first_msg)
-            has_specifics = any(re.search(p, first_msg, re.IGNORECASE) for p in SPECIFICS_PATTERNS)
-            if length >= 50 and has_specifics:
-                context_scores.append(5)
-            elif length >= 30 or has_specifics:
-                context_scores.append(3)
-            else:
-                context_scores.append(1)
+    # 첫 요청의 길이/구체성 점수 (session_message_features에서 세션별로 계산)
+    context_scores = table.context_points
 
     context_score = round(sum(context_scores) / len(context_scores)) if context_scores else 3
     details['context_score'] = context_score
 
-    topic_switches = 0
-    for s in sessions:
-        msgs = s['user_messages']
-        for i in range(1, len(msgs)):
-            prev_words = set(msgs[i - 1].lower().split())
-            curr_words = set(msgs[i].lower().split())
-            if prev_words and curr_words:
-                overlap = len(prev_words & curr_words) / max(len(prev_words), len(curr_words))
-                if overlap < 0.08 and len(prev_words) > 3 and len(curr_words) > 3:
-                    topic_switches += 1
+    # 직전 메시지와 단어 겹침이 8% 미만인 주제 전환 수
+    topic_switches = table.count('topic_switch')
 
     if topic_switches <= 1:
         consistency_score = 5
@@ -1280,7 +2818,7 @@ def calc_intent_score(sessions: List[Dict]) -> Tuple[int, Dict]:
     return correction_score + context_score + consistency_score, details
 
 
-def calc_efficiency_score(sessions: List[Dict]) -> Tuple[int, Dict]:
+def calc_efficiency_score(sessions: List[Dict], features: 'MessageFeatures' = None) -> Tuple[int, Dict]:
     """작업 효율성 (30점)"""
     details = {}
 
@@ -1326,17 +2864,8 @@ def calc_efficiency_score(sessions: List[Dict]) -> Tuple[int, Dict]:
     details['success_rate'] = round(success_rate * 100, 1)
     details['success_score'] = success_score
 
-    completion_found = False
-    for s in sessions:
-        msgs = s['user_messages']
-        if msgs:
-            tail_start = max(0, len(msgs) - max(1, len(msgs) * 30 // 100))
-            for msg in msgs[tail_start:]:
-                if any(kw in msg.lower() for kw in COMPLETION_KEYWORDS):
-                    completion_found = True
-                    break
-        if completion_found:
-            break
+    # 세션 마지막 30% 메시지에 완료 표현이 있는지
+    completion_found = (features or MessageFeatures(sessions)).any_tail_completion()
 
     completion_score = 10 if completion_found else 7
     details['completion_score'] = completion_score
@@ -1450,23 +2979,7 @@ def calc_workflow_score(sessions: List[Dict], complexity: str) -> Tuple[int, Dic
     details['has_commit_skill'] = has_commit_skill
     details['auto_score'] = auto_score
 
-    same_error_retries = 0
-    for s in sessions:
-        failed_ids = {tr['tool_use_id'] for tr in s['tool_results'] if tr['is_error']}
-        consecutive_fails = 0
-        prev_failed_name = None
-        for tu in s['tool_uses']:
-            if tu['id'] in failed_ids:
-                if prev_failed_name == tu['name']:
-                    consecutive_fails += 1
-                prev_failed_name = tu['name']
-            else:
-                if consecutive_fails >= 2:
-                    same_error_retries += 1
-                consecutive_fails = 0
-                prev_failed_name = None
-        if consecutive_fails >= 2:
-            same_error_retries += 1
+    same_error_retries = sum(summarize_tool_graph(get_tool_graph(s))['retry_loops'] for s in sessions)
 
     if same_error_retries == 0:
         error_adapt_score = 7
@@ -1568,121 +3081,548 @@ def generate_feedback(intent_d, efficiency_d, fitness_d, workflow_d, complexity)
 
 
 # ============================================================================
-# Section 5: Main Orchestration
+# Section 4.5: Sampling (근사 분석)
 # ============================================================================
 
-def _build_analysis_result(sessions: List[Dict[str, Any]], start: datetime, end: datetime) -> Dict:
-    """파싱된 세션 리스트로부터 분석 결과 dict를 생성하는 헬퍼"""
-    skill_names, command_names = get_skill_and_command_names()
-    skill_descriptions = get_skill_descriptions()
-
-    # Basic statistics
-    stats = compute_statistics(sessions)
-    top_tools = analyze_tool_usage(sessions)
-    main_workflow = analyze_workflow_patterns(sessions)
+# 95% 신뢰구간 z 값
+SAMPLE_Z = 1.96
 
-    # Task types - Top 3
-    task_type_counter = Counter()
-    for s in sessions:
-        types = classify_task_types(s)
-        for t in types:
-            task_type_counter[t] += 1
-    main_tasks = [t for t, _ in task_type_counter.most_common(3)]
-
-    # Skills, Custom Commands, Agents, Built-in Commands 수집
-    skills_counter = Counter()
-    custom_commands_counter = Counter()
-    agents_counter = Counter()
-    agent_descriptions = {}
-    commands_counter = Counter()
 
-    for s in sessions:
-        for sc in s.get('has_skill_calls', []):
-            skill_name = sc.get('skill', '')
-            if skill_name:
-                skills_counter[f"/{skill_name}"] += 1
-        for cc in s.get('has_custom_command_calls', []):
-            cmd_name = cc.get('command', '')
-            if cmd_name:
-                custom_commands_counter[f"/{cmd_name}"] += 1
-        for tc in s.get('has_task_calls', []):
-            agent_type = tc.get('subagent_type', '')
-            desc = tc.get('description', '')
-            if agent_type:
-                agents_counter[agent_type] += 1
-                if agent_type == 'Explore':
-                    agent_descriptions[agent_type] = '프로젝트 구조 및 설정 탐색'
-                elif agent_type not in agent_descriptions and desc:
-                    agent_descriptions[agent_type] = desc
-        # commands_used에서 스킬/커스텀 커맨드 이름을 제외하고 빌트인만 추가
-        known_names = {f"/{n}" for n in skill_names} | {f"/{n}" for n in command_names}
-        for cmd in s.get('commands_used', []):
-            if cmd not in known_names:
-                commands_counter[cmd] += 1
-
-    # Scoring
-    complexity = classify_complexity(sessions)
-    intent_score, intent_details = calc_intent_score(sessions)
-    efficiency_score, efficiency_details = calc_efficiency_score(sessions)
-    fitness_score, fitness_details = calc_tool_fitness_score(sessions, complexity)
-    workflow_score, workflow_details = calc_workflow_score(sessions, complexity)
-    total_score = intent_score + efficiency_score + fitness_score + workflow_score
-    grade, grade_desc = get_grade(total_score)
-    good_points, improve_points = generate_feedback(
-        intent_details, efficiency_details, fitness_details, workflow_details, complexity
-    )
+def _reservoir_sample(items, k: int, rng: random.Random) -> list:
+    """Algorithm R: 길이를 모르는 스트림에서 k개를 균등 추출 (원래 순서 유지)"""
+    reservoir = []
+    for i, item in enumerate(items):
+        if i < k:
+            reservoir.append((i, item))
+        else:
+            j = rng.randint(0, i)
+            if j < k:
+                reservoir[j] = (i, item)
+    return [item for _, item in sorted(reservoir, key=lambda x: x[0])]
+
+
+# 층 구분 후보 (세밀한 순). --max-sessions가 층 수보다 작으면 모든 층에 표본을 줄 수 있을 때까지 층을 합침
+SAMPLE_STRATIFICATIONS = (
+    ('project x day', lambda path, session_date: (path.parent.name, session_date.date())),
+    ('project', lambda path, session_date: (path.parent.name,)),
+    ('none', lambda path, session_date: ()),
+)
+
+
+def _allocate_sample_sizes(strata_sizes: Dict[Any, int], sample_rate: float = None,
+                           max_sessions: int = None) -> Dict[Any, int]:
+    """층(stratum)별 표본 크기 결정. 층마다 최소 1개, max_sessions는 나머지를 비례 배분(최대 잉여법)
+
+    max_sessions를 쓸 때는 층 수가 max_sessions 이하여야 함 (sample_session_files가 층을 합쳐 보장).
+    """
+    sizes = dict(strata_sizes)
+    if sample_rate:
+        sizes = {key: min(n, max(1, round(n * sample_rate))) for key, n in strata_sizes.items()}
+    if max_sessions and sum(sizes.values()) > max_sessions:
+        spare = {key: n - 1 for key, n in strata_sizes.items()}
+        remaining = max_sessions - len(strata_sizes)
+        total_spare = sum(spare.values())
+        quotas = {key: remaining * n / total_spare for key, n in spare.items()}
+        sizes = {key: 1 + int(q) for key, q in quotas.items()}
+        remainder = max_sessions - sum(sizes.values())
+        for key in sorted(quotas, key=lambda k: quotas[k] - int(quotas[k]), reverse=True)[:remainder]:
+            sizes[key] += 1
+    return sizes
+
+
+def sample_session_files(discovered: List[Tuple[Path, datetime]], sample_rate: float = None,
+                         max_sessions: int = None, seed: int = 0) -> Tuple[List[Path], Dict[str, Any]]:
+    """프로젝트×날짜 층별 저수지 표본 추출. (표본 파일, 표본 정보) 반환
+
+    표본 정보의 strata_sizes는 층 키 → (모집단 N_h, 표본 n_h), assignment는 표본 파일 → 층 키.
+    """
+    for strata_by, stratum_of in SAMPLE_STRATIFICATIONS:
+        strata = {}
+        for path, session_date in discovered:
+            strata.setdefault(stratum_of(path, session_date), []).append(path)
+        if not max_sessions or len(strata) <= max_sessions:
+            break
 
-    # Prompt statistics
-    prompt_stats = analyze_prompt_statistics(sessions)
-    error_analysis = analyze_error_patterns(sessions)
-    usage_style = analyze_usage_style(sessions)
+    sizes = _allocate_sample_sizes({key: len(files) for key, files in strata.items()},
+                                   sample_rate, max_sessions)
+    rng = random.Random(seed)
+    sampled = []
+    assignment = {}
+    for key in sorted(strata):
+        chosen = _reservoir_sample(strata[key], sizes[key], rng)
+        sampled.extend(chosen)
+        assignment.update(dict.fromkeys(chosen, key))
+
+    return sorted(sampled), {
+        'population': len(discovered),
+        'sampled': len(sampled),
+        'strata': len(strata),
+        'strata_by': strata_by,
+        'strata_sizes': {key: (len(files), sizes[key]) for key, files in strata.items()},
+        'assignment': assignment,
+        'sample_rate': sample_rate,
+        'max_sessions': max_sessions,
+        'seed': seed,
+    }
 
-    # Calculate average words
-    all_messages = []
-    for session in sessions:
-        all_messages.extend(session.get('user_messages', []))
-    avg_words = 0
-    if all_messages:
-        total_words = sum(len(msg.split()) for msg in all_messages)
-        avg_words = round(total_words / len(all_messages))
-
-    # Config changes 집계 (스킬/커맨드/설정 변경 이력)
-    config_changes_by_key = {}  # (category, name) → {'actions': set(), 'count': int, 'details': list}
-    for session in sessions:
-        for change in session.get('config_changes', []):
-            key = (change['category'], change['name'])
-            if key not in config_changes_by_key:
-                config_changes_by_key[key] = {'actions': set(), 'count': 0, 'details': []}
-            config_changes_by_key[key]['actions'].add(change['action'])
-            config_changes_by_key[key]['count'] += 1
-            detail = change.get('detail', '')
-            if detail and detail not in config_changes_by_key[key]['details']:
-                config_changes_by_key[key]['details'].append(detail)
-
-    config_changes_result = []
-    for (category, name), info in sorted(config_changes_by_key.items()):
-        deduped = _deduplicate_details(info['details'])
-        config_changes_result.append({
-            'category': category,
-            'name': name,
-            'action': 'modified' if 'modified' in info['actions'] else 'created/modified',
-            'changes': info['count'],
-            'details': deduped[:10],
-        })
 
-    # Build simplified result
+def _t_quantile(df: float) -> float:
+    """자유도 df인 t 분포의 97.5% 분위수 (df 1, 2는 정확값, 그 이상은 Cornish-Fisher 전개)"""
+    if df < 1.5:
+        return 12.706
+    if df < 2.5:
+        return 4.303
+    z = SAMPLE_Z
+    return (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+def _ratio_interval(pairs: List[Tuple[float, float]], strata: List[Any],
+                    strata_sizes: Dict[Any, Tuple[int, int]], scale: float = 1) -> Dict[str, Any]:
+    """층화 비율 추정량 sum(w*y)/sum(w*x) (w = N_h/n_h)와 층화 선형화 분산 기반 95% 신뢰구간
+
+    분산은 잔차 e = y - R*x의 층별 추정 총합 분산의 합 / X^2. 표본 2개 이상인 층은
+    N_h^2 (1 - n_h/N_h) s_h^2 / n_h, 표본이 1개인 비전수 층은 층내 분산을 추정할 수 없으므로
+    그런 층들을 하나로 묶은 collapsed strata 추정량 L/(L-1) sum (1 - 1/N_h)(t_h - t_mean)^2 (t_h = N_h e_h)을 사용.
+    층이 작아 분산 추정의 자유도가 낮으므로 구간 폭은 Satterthwaite 자유도의 t 분위수로 계산.
+    표본에 뽑혔지만 유효하지 않은 세션은 잔차 0으로 n_h에 포함.
+    """
+    weighted_y = weighted_x = 0.0
+    for (y, x), key in zip(pairs, strata):
+        population, sampled = strata_sizes[key]
+        weighted_y += population / sampled * y
+        weighted_x += population / sampled * x
+    if not pairs or weighted_x == 0:
+        return {'estimate': 0, 'low': 0, 'high': 0}
+    ratio = weighted_y / weighted_x
+    if len(pairs) < 2:
+        return {'estimate': round(ratio * scale, 2), 'low': None, 'high': None}
+
+    residuals = {}
+    for (y, x), key in zip(pairs, strata):
+        residuals.setdefault(key, []).append(y - ratio * x)
+
+    components = []  # (분산 기여, 자유도)
+    singles = []
+    for key, (population, sampled) in strata_sizes.items():
+        if sampled >= population:
+            continue
+        values = residuals.get(key, [])
+        if sampled == 1:
+            singles.append((population * sum(values), 1 - 1 / population))
+            continue
+        mean = sum(values) / sampled
+        s2 = (sum((e - mean) ** 2 for e in values) + (sampled - len(values)) * mean ** 2) / (sampled - 1)
+        components.append((population ** 2 * (1 - sampled / population) * s2 / sampled, sampled - 1))
+    if len(singles) > 1:
+        mean_total = sum(total for total, _ in singles) / len(singles)
+        components.append((len(singles) / (len(singles) - 1) * sum(
+            fpc * (total - mean_total) ** 2 for total, fpc in singles), len(singles) - 1))
+    elif singles:
+        # 묶을 층이 하나뿐이면 표본 2개 이상인 층의 평균 기여를 빌려 씀
+        components.append((sum(v for v, _ in components) / len(components) if components else 0.0, 1))
+
+    variance = sum(v for v, _ in components)
+    denominator = sum(v ** 2 / df for v, df in components)
+    df = variance ** 2 / denominator if denominator else float('inf')
+    margin = (_t_quantile(df) if df != float('inf') else SAMPLE_Z) * math.sqrt(variance) / weighted_x
     return {
+        'estimate': round(ratio * scale, 2),
+        'low': round(max(0.0, ratio - margin) * scale, 2),
+        'high': round((ratio + margin) * scale, 2),
+    }
+
+
+def _count_fields(result: Dict[str, Any], truncated: bool = True):
+    """결과의 건수 필드를 (컨테이너, 키, 경로, 반올림 자릿수)로 나열 (평균/비율 필드와 --sections로 빠진 섹션은 제외)
+
+    경로는 목록 항목을 이름으로 식별하므로 세션 부분집합의 결과끼리 같은 필드를 맞춰 볼 수 있음.
+    자릿수가 None이면 정수 건수, 2면 초 단위 합계. truncated=False면 상위 N개로 잘린 목록은 제외.
+    """
+    if 'summary' in result:
+        yield result['summary'], 'sessions', ('summary', 'sessions'), None
+    if 'usage_style' in result:
+        usage_style = result['usage_style']
+        distribution = usage_style['prompt_stats']['distribution']
+        for key in distribution:
+            yield distribution, key, ('prompt_distribution', key), None
+        for scale, info in usage_style['session_scale'].items():
+            yield info, 'count', ('session_scale', scale), None
+        for key in ('initial', 'followup'):
+            yield usage_style['correction_ratio'], key, ('correction_ratio', key), None
+    if 'tool_usage' in result:
+        for key in ('skills', 'custom_commands', 'agents', 'commands', 'top_tools'):
+            if key == 'top_tools' and not truncated:
+                continue
+            for item in result['tool_usage'][key]:
+                yield item, 'count', ('tool_usage', key, item.get('name', item.get('type'))), None
+    if 'error_summary' in result:
+        errors = result['error_summary']
+        yield errors, 'total', ('error_summary', 'total'), None
+        for key in errors['recovery']:
+            yield errors['recovery'], key, ('error_summary', 'recovery', key), None
+    for change in result.get('config_changes', []):
+        yield change, 'changes', ('config_changes', change['category'], change['name']), None
+    if 'token_usage' in result:
+        token_usage = result['token_usage']
+        groups = [(('totals',), token_usage['totals'])]
+        groups += [(('by_model', model), totals) for model, totals in token_usage['by_model'].items()]
+        groups += [(('by_day', day), totals) for day, totals in token_usage['by_day'].items()]
+        for prefix, totals in groups:
+            for key in TOKEN_USAGE_FIELDS + ('total_tokens',):
+                yield totals, key, ('token_usage',) + prefix + (key,), None
+    for model, info in result.get('by_model', {}).items():
+        for key in ('sessions', 'messages', 'tool_calls', 'tool_errors'):
+            yield info, key, ('by_model', model, key), None
+        for key in TOKEN_USAGE_FIELDS + ('total_tokens',):
+            yield info['tokens'], key, ('by_model', model, 'tokens', key), None
+        yield info['turn_latency'], 'count', ('by_model', model, 'turn_latency', 'count'), None
+        yield info['turn_latency'], 'total', ('by_model', model, 'turn_latency', 'total'), 2
+    if 'tool_latency' in result:
+        for info in result['tool_latency']['by_tool']:
+            yield info, 'count', ('tool_latency', info['name'], 'count'), None
+            yield info, 'total', ('tool_latency', info['name'], 'total'), 2
+    if 'redundant_calls' in result:
+        redundant = result['redundant_calls']
+        yield redundant, 'total', ('redundant_calls', 'total'), None
+        yield redundant, 'wasted_result_bytes', ('redundant_calls', 'wasted_result_bytes'), None
+        for group in ('by_tool', 'by_day'):
+            for name, stats in redundant[group].items():
+                for key in ('count', 'bytes'):
+                    yield stats, key, ('redundant_calls', group, name, key), None
+    if 'tool_output_sizes' in result:
+        output_sizes = result['tool_output_sizes']
+        yield output_sizes, 'total_bytes', ('tool_output_sizes', 'total_bytes'), None
+        for info in output_sizes['by_tool']:
+            yield info, 'count', ('tool_output_sizes', info['name'], 'count'), None
+            yield info['bytes'], 'total', ('tool_output_sizes', info['name'], 'bytes'), None
+            yield info['lines'], 'total', ('tool_output_sizes', info['name'], 'lines'), None
+    if 'parallel_calls' in result:
+        parallel = result['parallel_calls']
+        for key in ('total_calls', 'batches', 'parallel_calls'):
+            yield parallel, key, ('parallel_calls', key), None
+        for size in parallel['batch_size_distribution']:
+            yield parallel['batch_size_distribution'], size, ('parallel_calls', 'batch_size', size), None
+        for key in ('runs', 'round_trips'):
+            yield parallel['missed_opportunities'], key, ('parallel_calls', 'missed', key), None
+    if 'workflow_patterns' in result and truncated:
+        for key in ('top_patterns', 'before_errors'):
+            for item in result['workflow_patterns'][key]:
+                yield item, 'count', ('workflow_patterns', key, item['pattern']), None
+    if 'context_growth' in result:
+        context_growth = result['context_growth']
+        yield context_growth, 'sessions_near_limit', ('context_growth', 'sessions_near_limit'), None
+        yield context_growth['peak_context'], 'count', ('context_growth', 'peak_context'), None
+        for key in context_growth['compactions']:
+            yield context_growth['compactions'], key, ('context_growth', 'compactions', key), None
+    if 'turn_timing' in result:
+        turn_timing = result['turn_timing']
+        for name, info in (('turn_latency', turn_timing['turn_latency']), ('idle_gaps', turn_timing['idle_gaps']),
+                           ('active', turn_timing['session_duration']['active']),
+                           ('wall_clock', turn_timing['session_duration']['wall_clock'])):
+            yield info, 'count', ('turn_timing', name, 'count'), None
+            yield info, 'total', ('turn_timing', name, 'total'), 2
+
+
+def _round_count(value: float, digits: Optional[int]) -> float:
+    return int(round(value)) if digits is None else round(value, digits)
+
+
+def _scale_counts(result: Dict[str, Any], factor: float) -> None:
+    """표본 결과의 건수 필드를 하나의 배율로 모집단 규모로 환산 (모든 표본 세션의 가중치가 같을 때)"""
+    for container, key, _, digits in list(_count_fields(result)):
+        container[key] = _round_count(container[key] * factor, digits)
+
+
+def _weight_counts(result: Dict[str, Any], groups: List[Tuple[float, List[Dict[str, Any]]]],
+                   start: datetime, end: datetime, sections: Tuple[str, ...] = None) -> None:
+    """건수 필드를 가중치별 세션 묶음의 가중합 sum(w_g * 건수_g)로 교체
+
+    묶음마다 결과를 다시 계산해 같은 경로의 건수를 더하고, 상위 N개로 잘린 목록(top_tools, 워크플로우 패턴)은
+    묶음 결과에서 빠질 수 있으므로 묶음 세션에서 직접 셈.
+    """
+    totals = Counter()
+    for weight, group in groups:
+        group_result = _build_analysis_result(group, start, end, sections)
+        for container, key, path, _ in _count_fields(group_result, truncated=False):
+            totals[path] += weight * container[key]
+        if 'tool_usage' in result:
+            for name, count in count_tool_names(group).items():
+                totals[('tool_usage', 'top_tools', name)] += weight * count
+        if 'workflow_patterns' in result:
+            index = build_workflow_index(group)
+            for item in result['workflow_patterns']['top_patterns']:
+                pattern = tuple(item['pattern'].split(' → '))
+                totals[('workflow_patterns', 'top_patterns', item['pattern'])] += weight * index.count(pattern)
+            for pattern, count in count_patterns_before_errors(group).items():
+                totals[('workflow_patterns', 'before_errors', ' → '.join(pattern))] += weight * count
+    for container, key, path, digits in list(_count_fields(result)):
+        container[key] = _round_count(totals[path], digits)
+
+
+def apply_sampling_estimates(result: Dict[str, Any], sessions: List[Dict[str, Any]], sampling: Dict[str, Any],
+                             strata: List[Any], start: datetime, end: datetime,
+                             sections: Tuple[str, ...] = None,
+                             features: 'MessageFeatures' = None) -> Dict[str, Any]:
+    """표본으로 계산한 결과의 건수를 층 가중치(N_h/n_h)로 모집단 규모로 환산하고, 비율 지표 신뢰구간을 추가해 근사치임을 표시
+
+    strata는 sessions와 같은 순서의 층 키. 층마다 표본 비율이 다르므로(층당 최소 1개, 반올림) 건수는
+    세션별 가중치의 가중합으로, 비율은 층화 비율 추정량으로 계산.
+    """
+    strata_sizes = sampling['strata_sizes']
+    weights = [strata_sizes[key][0] / strata_sizes[key][1] for key in strata]
+    groups = {}
+    for session, weight in zip(sessions, weights):
+        groups.setdefault(weight, []).append(session)
+    if len(groups) == 1:
+        _scale_counts(result, weights[0])
+    else:
+        _weight_counts(result, list(groups.items()), start, end, sections)
+
+    table = features or MessageFeatures(sessions)
+    message_counts = table.per_session()
+    corrections = table.per_session('correction', followups_only=True)
+    style_counts = table.per_session_styles()
+
+    error_pairs = []
+    correction_pairs = []
+    style_pairs = {style: [] for style in PROMPT_STYLES}
+    for index, s in enumerate(sessions):
+        results = s.get('tool_results', [])
+        error_pairs.append((sum(1 for r in results if r.get('is_error')), len(results)))
+        correction_pairs.append((corrections[index], 1 if message_counts[index] else 0))
+        for style, pairs in style_pairs.items():
+            pairs.append((style_counts[style][index], message_counts[index]))
+
+    result['approximate'] = {
+        'note': '표본 추출 기반 근사치 (건수는 층별 가중치 N_h/n_h로 모집단 규모로 환산, 비율은 95% 신뢰구간)',
+        'method': f"stratified_reservoir ({sampling['strata_by']})",
+        'sessions_total': sampling['population'],
+        'sessions_sampled': sampling['sampled'],
+        'strata': sampling['strata'],
+        'scale_factor': round(sum(weights) / len(weights), 2),
+        'seed': sampling['seed'],
+        'confidence_intervals': {
+            'error_rate': _ratio_interval(error_pairs, strata, strata_sizes, 100),
+            'correction_ratio': _ratio_interval(correction_pairs, strata, strata_sizes),
+            'style_distribution': {
+                style.replace('_style', ''): _ratio_interval(pairs, strata, strata_sizes, 100)
+                for style, pairs in style_pairs.items()
+            },
+        },
+    }
+    return result
+
+
+# ============================================================================
+# Section 4.6: Memory Profiling (--memprofile)
+# ============================================================================
+
+class MemoryProfiler:
+    """tracemalloc 기반 단계별 메모리 기록 (--memprofile)
+
+    단계(discovery/parse/scoring/serialization)마다 현재·최대 메모리를 기록하고 최대치를 초기화하므로
+    각 단계의 peak는 직전 체크포인트 이후 구간의 최대값. 파일 하나를 파싱한 뒤 늘어난 메모리를
+    세션당 보유 바이트로, 보유 메모리가 가장 클 때의 scoring 시점 스냅샷을 상위 할당 위치로 보고.
+    """
+
+    STAGES = ('discovery', 'parse', 'scoring', 'serialization')
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+        self.stages = {}
+        self.session_bytes = []
+        self.snapshot = None
+        self.snapshot_current = -1
+        tracemalloc.start()
+
+    def checkpoint(self, stage: str) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        entry = self.stages.setdefault(stage, {'count': 0, 'current': 0, 'peak': 0})
+        entry['count'] += 1
+        entry['current'] = max(entry['current'], current)
+        entry['peak'] = max(entry['peak'], peak)
+        if stage == 'scoring' and current > self.snapshot_current:
+            # 세션 리스트를 들고 있는 시점 중 보유 메모리가 가장 큰 순간의 할당 위치
+            self.snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ])
+            self.snapshot_current = current
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        return current
+
+    def session_retained(self, session_id: str, size: int) -> None:
+        self.session_bytes.append((size, session_id))
+
+    def report(self) -> Dict[str, Any]:
+        sizes = sorted(size for size, _ in self.session_bytes)
+        largest = max(self.session_bytes, default=(0, ''))
+        top_sites = []
+        if self.snapshot is not None:
+            for stat in self.snapshot.statistics('lineno')[:self.top_n]:
+                frame = stat.traceback[0]
+                top_sites.append({'site': f'{os.path.basename(frame.filename)}:{frame.lineno}',
+                                  'bytes': stat.size, 'blocks': stat.count})
+        return {
+            'stages': {stage: self.stages[stage] for stage in self.STAGES if stage in self.stages},
+            'per_session': {
+                'sessions': len(sizes),
+                'avg_bytes': round(sum(sizes) / len(sizes)) if sizes else 0,
+                'p95_bytes': sizes[min(len(sizes) - 1, int(len(sizes) * 0.95))] if sizes else 0,
+                'max_bytes': largest[0],
+                'max_session': largest[1],
+            },
+            'top_allocation_sites': top_sites,
+        }
+
+    def print_report(self) -> None:
+        report = self.report()
+        mb = 1024 * 1024
+        print('[memprofile] 단계별 메모리 (MB)          횟수    현재(최대)    구간 피크(최대)', file=sys.stderr)
+        for stage, entry in report['stages'].items():
+            print(f"  {stage:<16} {entry['count']:>18} {entry['current'] / mb:>13.1f} {entry['peak'] / mb:>18.1f}",
+                  file=sys.stderr)
+        per_session = report['per_session']
+        if per_session['sessions']:
+            print(f"[memprofile] 세션당 보유 메모리: {per_session['sessions']}개, "
+                  f"평균 {per_session['avg_bytes'] / 1024:.1f} KB, p95 {per_session['p95_bytes'] / 1024:.1f} KB, "
+                  f"최대 {per_session['max_bytes'] / 1024:.1f} KB ({per_session['max_session']})", file=sys.stderr)
+        if report['top_allocation_sites']:
+            print('[memprofile] 상위 할당 위치 (scoring 시점 보유 메모리 기준)', file=sys.stderr)
+            for site in report['top_allocation_sites']:
+                print(f"  {site['site']:<32} {site['bytes'] / mb:>8.2f} MB  {site['blocks']:>10,} blocks",
+                      file=sys.stderr)
+
+
+_memprofiler: Optional[MemoryProfiler] = None
+
+
+def enable_memprofile(top_n: int = 10) -> MemoryProfiler:
+    """메모리 프로파일링 시작. 프로세스 종료 시 stderr로 보고"""
+    global _memprofiler
+    _memprofiler = MemoryProfiler(top_n)
+    atexit.register(_memprofiler.print_report)
+    return _memprofiler
+
+
+def _mem_checkpoint(stage: str) -> int:
+    """--memprofile 활성 시 단계 메모리 기록 (비활성이면 아무것도 하지 않고 0)"""
+    return _memprofiler.checkpoint(stage) if _memprofiler is not None else 0
+
+
+def serialize_result(result: Any) -> str:
+    """출력용 JSON 문자열 (직렬화 직후 메모리 체크포인트)"""
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    _mem_checkpoint('serialization')
+    return text
+
+
+# ============================================================================
+# Section 5: Main Orchestration
+# ============================================================================
+
+# 리포트 섹션 레지스트리: 섹션 이름 → (결과 키, 파서가 추출해야 하는 필드)
+# --sections로 일부만 요청하면 파서는 필요 필드의 합집합만 추출 (PARSE_FIELDS 참고)
+REPORT_SECTIONS = {
+    'summary': (('summary',), {'user_text'}),
+    'tokens': (('token_usage',), {'usage'}),
+    'models': (('by_model',), {'usage', 'graph'}),
+    'style': (('usage_style',), {'user_text', 'commands'}),
+    'tools': (('tool_usage',), {'commands'}),
+    'redundant': (('redundant_calls',), {'graph'}),
+    'output_sizes': (('tool_output_sizes',), {'graph'}),
+    'parallel': (('parallel_calls',), set()),
+    'latency': (('tool_latency',), {'graph'}),
+    'turns': (('turn_timing',), set()),
+    'context': (('context_growth',), {'usage'}),
+    'scoring': (('scoring', 'feedback'), {'user_text', 'commands', 'graph'}),
+    'errors': (('error_summary',), {'graph'}),
+    'workflow': (('main_workflow', 'workflow_patterns'), {'graph'}),
+    'config': (('config_changes',), {'config_changes'}),
+}
+
+# 필드 간 의존성: 그래프는 도구 입력(재시도 유사도)과 결과(성공/실패)로 만듦
+PARSE_FIELD_DEPENDENCIES = {
+    'graph': {'tool_inputs', 'tool_results'},
+}
+
+# 표본 추출 시 신뢰구간 계산(apply_sampling_estimates)에 필요한 필드
+SAMPLING_FIELDS = {'user_text', 'tool_results'}
+
+
+def parse_sections(value: str) -> Tuple[str, ...]:
+    """'errors,tools' 형식의 --sections 값을 레지스트리 순서의 섹션 튜플로 변환"""
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(names - set(REPORT_SECTIONS))
+    if unknown or not names:
+        raise ValueError(f"알 수 없는 섹션: {', '.join(unknown) or value!r} (가능: {', '.join(REPORT_SECTIONS)})")
+    return tuple(name for name in REPORT_SECTIONS if name in names)
+
+
+def required_parse_fields(sections: Tuple[str, ...] = None, sampled: bool = False) -> Optional[frozenset]:
+    """요청 섹션이 선언한 필드의 합집합 (의존 필드 포함). 전체 리포트면 None (모든 필드 추출)"""
+    if sections is None:
+        return None
+    fields = set()
+    for name in sections:
+        fields |= REPORT_SECTIONS[name][1]
+    if sampled:
+        fields |= SAMPLING_FIELDS
+    for field, dependencies in PARSE_FIELD_DEPENDENCIES.items():
+        if field in fields:
+            fields |= dependencies
+    return frozenset(fields)
+
+
+def _build_analysis_result(sessions: List[Dict[str, Any]], start: datetime, end: datetime,
+                           sections: Tuple[str, ...] = None, features: 'MessageFeatures' = None) -> Dict:
+    """파싱된 세션 리스트로부터 분석 결과 dict를 생성하는 헬퍼
+
+    sections를 주면 해당 섹션만 계산하고 결과 키 순서는 전체 리포트와 같게 유지 (부분 리포트에는 sections 목록 추가).
+    메시지 특징 표는 여기서 한 번만 만들어(features로 받으면 그대로 사용) 이를 쓰는 분석 함수에 넘김.
+    """
+    wanted = set(REPORT_SECTIONS) if sections is None else set(sections)
+    if features is None and wanted & {'style', 'scoring'}:
+        features = MessageFeatures(sessions)
+    result = {
         'date_range': {
             'start': start.isoformat(),
             'end': end.isoformat(),
         },
-        'summary': {
+    }
+
+    if 'summary' in wanted:
+        stats = compute_statistics(sessions)
+        # Task types - Top 3
+        task_type_counter = Counter()
+        for s in sessions:
+            types = classify_task_types(s)
+            for t in types:
+                task_type_counter[t] += 1
+        main_tasks = [t for t, _ in task_type_counter.most_common(3)]
+        result['summary'] = {
             'sessions': stats['total_sessions'],
             'avg_messages': stats['avg_messages_per_session'],
             'avg_tool_calls': stats['avg_tool_calls_per_session'],
             'main_tasks': main_tasks,
-        },
-        'usage_style': {
+        }
+
+    if 'tokens' in wanted:
+        result['token_usage'] = analyze_token_usage(sessions)
+    if 'models' in wanted:
+        result['by_model'] = analyze_by_model(sessions)
+
+    # usage_style은 style 섹션과 feedback의 context_tips가 함께 사용
+    usage_style = analyze_usage_style(sessions, features) if wanted & {'style', 'scoring'} else {}
+    if 'style' in wanted:
+        prompt_stats = analyze_prompt_statistics(sessions, features)
+
+        # Calculate average words
+        avg_words = round(features.total('words') / features.size) if features.size else 0
+
+        result['usage_style'] = {
             'prompt_stats': {
                 'avg_length': prompt_stats.get('avg_length', 0),
                 'avg_words': avg_words,
@@ -1704,15 +3644,77 @@ def _build_analysis_result(sessions: List[Dict[str, Any]], start: datetime, end:
                 'followup': usage_style.get('correction_frequency', {}).get('follow_up_corrections', 0),
                 'ratio': usage_style.get('correction_frequency', {}).get('ratio', 0),
             },
-        },
-        'tool_usage': {
+        }
+
+    if 'tools' in wanted:
+        skill_names, command_names = get_skill_and_command_names()
+        skill_descriptions = get_skill_descriptions()
+        top_tools = analyze_tool_usage(sessions)
+
+        # Skills, Custom Commands, Agents, Built-in Commands 수집
+        skills_counter = Counter()
+        custom_commands_counter = Counter()
+        agents_counter = Counter()
+        agent_descriptions = {}
+        commands_counter = Counter()
+
+        for s in sessions:
+            for sc in s.get('has_skill_calls', []):
+                skill_name = sc.get('skill', '')
+                if skill_name:
+                    skills_counter[f"/{skill_name}"] += 1
+            for cc in s.get('has_custom_command_calls', []):
+                cmd_name = cc.get('command', '')
+                if cmd_name:
+                    custom_commands_counter[f"/{cmd_name}"] += 1
+            for tc in s.get('has_task_calls', []):
+                agent_type = tc.get('subagent_type', '')
+                desc = tc.get('description', '')
+                if agent_type:
+                    agents_counter[agent_type] += 1
+                    if agent_type == 'Explore':
+                        agent_descriptions[agent_type] = '프로젝트 구조 및 설정 탐색'
+                    elif agent_type not in agent_descriptions and desc:
+                        agent_descriptions[agent_type] = desc
+            # commands_used에서 스킬/커스텀 커맨드 이름을 제외하고 빌트인만 추가
+            known_names = {f"/{n}" for n in skill_names} | {f"/{n}" for n in command_names}
+            for cmd in s.get('commands_used', []):
+                if cmd not in known_names:
+                    commands_counter[cmd] += 1
+
+        result['tool_usage'] = {
             'skills': [{'name': name, 'count': count, 'description': skill_descriptions.get(name, '')} for name, count in skills_counter.most_common()],
             'custom_commands': [{'name': name, 'count': count, 'description': ''} for name, count in custom_commands_counter.most_common()],
             'agents': [{'type': agent_type, 'count': count, 'description': agent_descriptions.get(agent_type, '')} for agent_type, count in agents_counter.most_common()],
             'commands': [{'name': name, 'count': count, 'description': BUILTIN_COMMAND_DESCRIPTIONS.get(name, '')} for name, count in commands_counter.most_common()],
             'top_tools': top_tools,
-        },
-        'scoring': {
+        }
+
+    if 'redundant' in wanted:
+        result['redundant_calls'] = analyze_redundant_calls(sessions)
+    if 'output_sizes' in wanted:
+        result['tool_output_sizes'] = analyze_tool_output_sizes(sessions)
+    if 'parallel' in wanted:
+        result['parallel_calls'] = analyze_parallel_calls(sessions)
+    if 'latency' in wanted:
+        result['tool_latency'] = analyze_tool_latency(sessions)
+    if 'turns' in wanted:
+        result['turn_timing'] = analyze_turn_timing(sessions)
+    if 'context' in wanted:
+        result['context_growth'] = analyze_context_growth(sessions)
+
+    if 'scoring' in wanted:
+        complexity = classify_complexity(sessions)
+        intent_score, intent_details = calc_intent_score(sessions, features)
+        efficiency_score, efficiency_details = calc_efficiency_score(sessions, features)
+        fitness_score, fitness_details = calc_tool_fitness_score(sessions, complexity)
+        workflow_score, workflow_details = calc_workflow_score(sessions, complexity)
+        total_score = intent_score + efficiency_score + fitness_score + workflow_score
+        grade, grade_desc = get_grade(total_score)
+        good_points, improve_points = generate_feedback(
+            intent_details, efficiency_details, fitness_details, workflow_details, complexity
+        )
+        result['scoring'] = {
             'total': total_score,
             'grade': grade,
             'categories': {
@@ -1721,76 +3723,413 @@ def _build_analysis_result(sessions: List[Dict[str, Any]], start: datetime, end:
                 'fitness': {'score': fitness_score, 'max': 25},
                 'workflow': {'score': workflow_score, 'max': 20},
             },
-        },
-        'feedback': {
+        }
+        result['feedback'] = {
             'strengths': good_points,
             'improvements': improve_points,
             'context_tips': usage_style.get('context_management_tips', []),
-        },
-        'error_summary': {
+        }
+
+    if 'errors' in wanted:
+        error_analysis = analyze_error_patterns(sessions)
+        result['error_summary'] = {
             'rate': error_analysis.get('error_rate', 0),
             'total': error_analysis.get('total_errors', 0),
             'main_types': list(error_analysis.get('error_types', {}).keys())[:2],
             'recovery': {
                 'immediate_fix': error_analysis.get('recovery_patterns', {}).get('immediate_fix', 0),
                 'alternative': error_analysis.get('recovery_patterns', {}).get('alternative_approach', 0),
+                'retry': error_analysis.get('recovery_patterns', {}).get('retry_same', 0),
+                'recovered': error_analysis.get('recovery_patterns', {}).get('recovered', 0),
+                'retry_loops': error_analysis.get('recovery_patterns', {}).get('retry_loops', 0),
             },
-        },
-        'main_workflow': main_workflow,
-        'config_changes': config_changes_result,
-    }
+        }
+
+    if 'workflow' in wanted:
+        workflow_index = build_workflow_index(sessions)
+        result['main_workflow'] = analyze_workflow_patterns(sessions, workflow_index)
+        result['workflow_patterns'] = mine_workflow_patterns(sessions, workflow_index)
+
+    if 'config' in wanted:
+        # Config changes 집계 (스킬/커맨드/설정 변경 이력)
+        config_changes_by_key = {}  # (category, name) → {'actions': set(), 'count': int, 'changes': list}
+        for session in sessions:
+            for change in session.get('config_changes', []):
+                key = (change['category'], change['name'])
+                if key not in config_changes_by_key:
+                    config_changes_by_key[key] = {'actions': set(), 'count': 0, 'changes': []}
+                config_changes_by_key[key]['actions'].add(change['action'])
+                config_changes_by_key[key]['count'] += 1
+                config_changes_by_key[key]['changes'].append(change)
+
+        config_changes_result = []
+        for (category, name), info in sorted(config_changes_by_key.items()):
+            config_changes_result.append({
+                'category': category,
+                'name': name,
+                'action': 'modified' if 'modified' in info['actions'] else 'created/modified',
+                'changes': info['count'],
+                'details': resolve_change_details(info['changes'], limit=10),
+            })
+        result['config_changes'] = config_changes_result
+
+    if sections is not None:
+        result['sections'] = list(sections)
+    return result
+
+
+# 병렬 파싱 시 워커당 대기시키는 파일 수 (완료 후 소비되지 않은 파싱 결과의 상한)
+PARSE_INFLIGHT_PER_WORKER = 4
+
 
+def parse_projects_roots(values) -> List[Tuple[str, Path]]:
+    """--projects-dir 값(들)을 (라벨, 경로) 리스트로 변환
 
-def analyze_date(target_date: str, projects_dir: str) -> Dict:
+    'LABEL=PATH' 형식이면 LABEL을, 아니면 경로 문자열 자체를 라벨로 사용. (라벨, 경로) 튜플은 그대로 둠.
+    """
+    if isinstance(values, (str, Path)):
+        values = [values]
+    roots = []
+    for value in values:
+        if isinstance(value, tuple):
+            label, path = value
+        else:
+            value = str(value)
+            label, sep, path = value.partition('=')
+            if not sep or not label or os.sep in label:
+                label, path = value, value
+        roots.append((label, Path(os.path.expanduser(str(path)))))
+    labels = [label for label, _ in roots]
+    if len(set(labels)) != len(labels):
+        raise ValueError(f'--projects-dir 라벨이 중복됩니다: {labels}')
+    return roots
+
+
+def _parse_valid_session(file_path: Path, fields: frozenset = None) -> Optional[Dict[str, Any]]:
+    """세션 파일을 파싱해 유효 세션(사용자 메시지·도구 호출 1개 이상)만 반환 (병렬 워커 진입점)"""
+    skill_names, command_names = get_skill_and_command_names()
+    parsed = parse_session_enhanced(file_path, skill_names, command_names, fields)
+    if parsed['total_user_messages'] >= 1 and len(parsed['tool_uses']) >= 1:
+        return parsed
+    return None
+
+
+def _ignore_sigint() -> None:
+    """프로세스 풀 워커 초기화: Ctrl+C(프로세스 그룹 전체에 전달)는 부모만 처리하고 워커는 진행 중 작업을 마침"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def parse_session_files(files: List[Path], workers: int = 1, fields: frozenset = None):
+    """파일 순서대로 파싱 결과(유효하지 않으면 None)를 yield (fields: 추출할 파서 필드, None이면 전체)
+
+    workers > 1이면 프로세스 풀에서 병렬 파싱하되, 미리 제출하는 작업을 워커당
+    PARSE_INFLIGHT_PER_WORKER개로 제한해 소비되지 않은 결과가 쌓이지 않게 함.
+    """
+    if workers <= 1 or len(files) <= 1:
+        for f in files:
+            yield _parse_valid_session(f, fields)
+        return
+
+    get_skill_registry()  # 풀 생성 전에 로드 (fork 시 워커가 그대로 물려받음)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint) as pool:
+        pending = deque()
+        for f in files:
+            pending.append(pool.submit(_parse_valid_session, f, fields))
+            if len(pending) >= workers * PARSE_INFLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def collect_root_sessions(roots: List[Tuple[str, Path]], start: datetime, end: datetime,
+                          include_projects: List[str] = None, exclude_projects: List[str] = None,
+                          sample_rate: float = None, max_sessions: int = None, seed: int = 0,
+                          workers: int = 1, sections: Tuple[str, ...] = None) -> List[Dict[str, Any]]:
+    """루트별 세션 발견 → (표본 추출) → 파싱. 루트마다 {label, root, found, files, inputs, sampling, sessions, order, strata} 반환
+
+    order는 sessions와 같은 순서의 루트 기준 상대 경로(parts)로, 여러 루트를 합칠 때 정렬 키로 사용.
+    strata는 표본 추출 시 sessions와 같은 순서의 (루트 라벨, 층 키)로, 층 가중치 계산에 사용.
+
+    발견은 루트별 스레드로 동시에 수행하고, 파싱은 모든 루트의 파일을 하나의 워커 풀에서 처리.
+    표본 추출은 루트마다 독립적으로 하므로 각 루트의 세션은 단일 루트 실행과 같음.
+    sections를 주면 해당 섹션이 선언한 필드만 파싱 (REPORT_SECTIONS).
+    """
+    undated_by_root = [[] for _ in roots]
+
+    def discover(index):
+        return discover_sessions(roots[index][1], start, end, include_projects, exclude_projects,
+                                 undated_by_root[index])
+
+    if len(roots) > 1:
+        with ThreadPoolExecutor(max_workers=len(roots)) as pool:
+            discovered_by_root = list(pool.map(discover, range(len(roots))))
+    else:
+        discovered_by_root = [discover(0)]
+
+    collected = []
+    for (label, root_path), discovered, undated in zip(roots, discovered_by_root, undated_by_root):
+        files = [p for p, _ in discovered]
+        # 입력 지문은 파싱 전에 떠 두어야 파싱 중 바뀐 파일이 다음 실행에서 감지됨.
+        # 아직 타임스탬프가 없는 파일도 지문을 떠 두어, 기록이 붙으면(디렉토리 mtime은 그대로) 결과를 무효화
+        inputs = [(str(p), _path_stamp(p)) for p in files + sorted(undated)]
+        sampling = None
+        if discovered and (sample_rate or max_sessions):
+            files, sampling = sample_session_files(discovered, sample_rate, max_sessions, seed)
+            # 여러 루트를 합쳐도 층이 섞이지 않도록 층 키에 루트 라벨을 붙임
+            sampling['strata_sizes'] = {(label, key): size for key, size in sampling['strata_sizes'].items()}
+        collected.append({'label': label, 'root': root_path, 'found': len(discovered), 'files': files,
+                          'inputs': inputs, 'sampling': sampling, 'sessions': [], 'order': [], 'strata': []})
+
+    owners = [entry for entry in collected for _ in entry['files']]
+    all_files = [f for entry in collected for f in entry['files']]
+    fields = required_parse_fields(sections, sampled=bool(sample_rate or max_sessions))
+    before = _mem_checkpoint('discovery')
+    for entry, file_path, parsed in zip(owners, all_files, parse_session_files(all_files, workers, fields)):
+        if parsed is not None:
+            entry['sessions'].append(parsed)
+            entry['order'].append(file_path.relative_to(entry['root']).parts)
+            if entry['sampling']:
+                entry['strata'].append((entry['label'], entry['sampling']['assignment'][file_path]))
+        if _memprofiler is not None:
+            after = _mem_checkpoint('parse')
+            if parsed is not None:
+                _memprofiler.session_retained(parsed['session_id'], after - before)
+            before = after
+    return collected
+
+
+def _merge_sampling(samplings: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """루트별 표본 정보를 합산 (모집단/표본/층 수, 층 크기)"""
+    if not samplings:
+        return None
+    merged = {key: samplings[0][key] for key in ('sample_rate', 'max_sessions', 'seed')}
+    for key in ('population', 'sampled', 'strata'):
+        merged[key] = sum(sampling[key] for sampling in samplings)
+    merged['strata_by'] = ' / '.join(dict.fromkeys(sampling['strata_by'] for sampling in samplings))
+    merged['strata_sizes'] = {key: size for sampling in samplings for key, size in sampling['strata_sizes'].items()}
+    return merged
+
+
+def _analyze_collected(collected: List[Dict[str, Any]], start: datetime, end: datetime,
+                       sections: Tuple[str, ...] = None) -> Tuple[Optional[Dict], Optional[str], int]:
+    """수집된 세션으로 분석 결과 생성. (결과, 에러 메시지, 대상 파일 수) 반환"""
+    if not any(entry['found'] for entry in collected):
+        return None, '세션 없음', 0
+    files = sum(len(entry['files']) for entry in collected)
+    # 여러 루트를 합칠 때도 단일 루트와 같은 순서(루트 기준 상대 경로순)로 모아 동점 순위/변경 설명 순서를 맞춤
+    ordered = sorted(
+        ((key, index, session, stratum) for index, entry in enumerate(collected)
+         for key, session, stratum in zip(entry['order'], entry['sessions'], entry['strata'] or repeat(None))),
+        key=lambda item: item[:2],
+    )
+    sessions = [session for _, _, session, _ in ordered]
+    if not sessions:
+        return None, '유효 세션 없음', files
+
+    # 메시지 특징 표는 본 결과와 샘플링 추정이 공유 (분석당 한 번만 생성)
+    features = MessageFeatures(sessions)
+    result = _build_analysis_result(sessions, start, end, sections, features)
+    sampling = _merge_sampling([entry['sampling'] for entry in collected if entry['sampling']])
+    if sampling:
+        apply_sampling_estimates(result, sessions, sampling, [stratum for *_, stratum in ordered],
+                                 start, end, sections, features)
+    _mem_checkpoint('scoring')
+    return result, None, files
+
+
+def _analyze_roots(projects_dir, start: datetime, end: datetime, workers: int = 1, inputs: list = None,
+                   **options) -> Tuple[Optional[Dict], Optional[str], int]:
+    """하나 이상의 프로젝트 루트를 분석. 루트가 여럿이면 합산 결과에 루트별 결과(by_root)를 추가
+
+    inputs 리스트를 넘기면 발견된 세션 파일의 (경로, (크기, mtime)) 지문을 덧붙임 (매니페스트 기록용).
+    """
+    roots = parse_projects_roots(projects_dir)
+    collected = collect_root_sessions(roots, start, end, workers=workers, **options)
+    if inputs is not None:
+        inputs.extend(stamp for entry in collected for stamp in entry['inputs'])
+    return _analyze_root_collections(collected, start, end, options.get('sections'))
+
+
+def _analyze_root_collections(collected: List[Dict[str, Any]], start: datetime, end: datetime,
+                              sections: Tuple[str, ...] = None) -> Tuple[Optional[Dict], Optional[str], int]:
+    """루트별 수집 결과를 합산 분석하고, 루트가 여럿이면 by_root 추가"""
+    result, error, files = _analyze_collected(collected, start, end, sections)
+    if result is not None and len(collected) > 1:
+        by_root = {}
+        for entry in collected:
+            root_result, root_error, root_files = _analyze_collected([entry], start, end, sections)
+            by_root[entry['label']] = root_result or {'error': root_error, 'sessions_found': root_files}
+        result['by_root'] = by_root
+    return result, error, files
+
+
+def analyze_date(target_date: str, projects_dir,
+                 include_projects: List[str] = None, exclude_projects: List[str] = None,
+                 sample_rate: float = None, max_sessions: int = None, seed: int = 0,
+                 workers: int = 1, inputs: list = None, sections: Tuple[str, ...] = None) -> Dict:
     """특정 날짜의 JSONL 로그를 통합 분석 (간소화된 스키마)"""
     date = datetime.strptime(target_date, '%Y-%m-%d')
     start = date.replace(hour=0, minute=0, second=0, microsecond=0)
     end = date.replace(hour=23, minute=59, second=59, microsecond=999999)
 
-    files = find_session_files(Path(projects_dir), start, end)
+    result, error, files = _analyze_roots(
+        projects_dir, start, end, workers, inputs,
+        include_projects=include_projects, exclude_projects=exclude_projects,
+        sample_rate=sample_rate, max_sessions=max_sessions, seed=seed, sections=sections,
+    )
+    if error:
+        return {'date': target_date, 'error': error, 'sessions_found': files}
+    return result
 
-    if not files:
-        return {'date': target_date, 'error': '세션 없음', 'sessions_found': 0}
 
-    skill_names, command_names = get_skill_and_command_names()
+def analyze_date_range(start_str: str, end_str: str, projects_dir,
+                       include_projects: List[str] = None, exclude_projects: List[str] = None,
+                       sample_rate: float = None, max_sessions: int = None, seed: int = 0,
+                       workers: int = 1, inputs: list = None, sections: Tuple[str, ...] = None) -> Dict:
+    """날짜 범위의 모든 세션을 합산하여 단일 분석 결과 반환 (--weekly 모드용)"""
+    start_dt = datetime.strptime(start_str, '%Y-%m-%d').replace(hour=0, minute=0, second=0, microsecond=0)
+    end_dt = datetime.strptime(end_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59, microsecond=999999)
 
-    sessions = []
-    for f in files:
-        parsed = parse_session_enhanced(f, skill_names, command_names)
-        if parsed['total_user_messages'] >= 1 and len(parsed['tool_uses']) >= 1:
-            sessions.append(parsed)
+    result, error, files = _analyze_roots(
+        projects_dir, start_dt, end_dt, workers, inputs,
+        include_projects=include_projects, exclude_projects=exclude_projects,
+        sample_rate=sample_rate, max_sessions=max_sessions, seed=seed, sections=sections,
+    )
+    if error:
+        return {'date_range': {'start': start_str, 'end': end_str}, 'error': error, 'sessions_found': files}
+    return result
 
-    if not sessions:
-        return {'date': target_date, 'error': '유효 세션 없음', 'sessions_found': len(files)}
 
-    return _build_analysis_result(sessions, start, end)
+def iter_daily_results(start_str: str, end_str: str, projects_dir, **options):
+    """날짜 범위를 하루씩 분석하여 유효한 일자별 결과를 순서대로 yield (실패한 날짜는 stderr 보고)"""
+    current = datetime.strptime(start_str, '%Y-%m-%d')
+    end = datetime.strptime(end_str, '%Y-%m-%d')
+    while current <= end:
+        date_str = current.strftime('%Y-%m-%d')
+        result = analyze_date(date_str, projects_dir, **options)
+        if 'error' not in result:
+            yield result
+        else:
+            print(f"  {date_str}: {result.get('error', '?')}", file=sys.stderr)
+        current += timedelta(days=1)
 
 
-def analyze_date_range(start_str: str, end_str: str, projects_dir: str) -> Dict:
-    """날짜 범위의 모든 세션을 합산하여 단일 분석 결과 반환 (--weekly 모드용)"""
-    start_dt = datetime.strptime(start_str, '%Y-%m-%d').replace(hour=0, minute=0, second=0, microsecond=0)
-    end_dt = datetime.strptime(end_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59, microsecond=999999)
+MANIFEST_VERSION = 2
 
-    files = find_session_files(Path(projects_dir), start_dt, end_dt)
 
-    if not files:
-        return {'date_range': {'start': start_str, 'end': end_str}, 'error': '세션 없음', 'sessions_found': 0}
+@lru_cache(maxsize=1)
+def analyzer_version() -> str:
+    """분석기 버전 = 이 스크립트 내용의 해시 (코드가 바뀌면 이전 결과를 재사용하지 않음)"""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:16]
 
-    skill_names, command_names = get_skill_and_command_names()
 
-    sessions = []
-    for f in files:
-        parsed = parse_session_enhanced(f, skill_names, command_names)
-        if parsed['total_user_messages'] >= 1 and len(parsed['tool_uses']) >= 1:
-            sessions.append(parsed)
+class SummaryManifest:
+    """~/.claude/summaries/manifest.json: 출력 파일별 입력 지문과 분석기 버전
 
-    if not sessions:
-        return {'date_range': {'start': start_str, 'end': end_str}, 'error': '유효 세션 없음', 'sessions_found': len(files)}
+    항목 = {analyzer, params, span: [시작일, 끝일], dirs: 루트/프로젝트 디렉토리 mtime,
+    inputs: [[세션 파일, [크기, mtime]]]}. 분석기 버전과 분석 옵션(params)이 같고, 결과를 만든 세션 파일이
+    그대로이며 그 뒤 새로 생긴 세션 중 기간(span)에 드는 것이 없고, 출력 파일이 남아 있으면 재계산하지 않음.
+    """
 
-    return _build_analysis_result(sessions, start_dt, end_dt)
+    def __init__(self, path: str = None, force: bool = False):
+        self.path = path or os.path.expanduser('~/.claude/summaries/manifest.json')
+        self.force = force
+        self.entries = {}
+        self.updated = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('outputs', {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    @staticmethod
+    def _key(output_path: str) -> str:
+        return os.path.abspath(output_path)
+
+    def is_fresh(self, output_path: str, roots: List[Tuple[str, Path]], params: Dict[str, Any],
+                 span: Tuple[str, str]) -> bool:
+        """같은 옵션·출력 형태·기간(span)으로 만든 출력이고 입력이 그대로인지"""
+        entry = self.entries.get(self._key(output_path))
+        return bool(
+            not self.force
+            and entry
+            and entry.get('analyzer') == analyzer_version()
+            and entry.get('params') == params
+            and entry.get('span') == list(span)
+            and os.path.exists(output_path)
+            and _span_inputs_unchanged(roots, entry['dirs'], entry['inputs'], *_day_span(*entry['span']),
+                                  params.get('project'), params.get('exclude_project'))
+        )
+
+    def record(self, output_path: str, dir_stamps: Tuple, inputs: List[Tuple[str, Any]],
+               params: Dict[str, Any], span: Tuple[str, str]) -> None:
+        """span은 출력이 다루는 (시작일, 끝일) YYYY-MM-DD"""
+        key = self._key(output_path)
+        self.entries[key] = {
+            'analyzer': analyzer_version(),
+            'params': params,
+            'span': list(span),
+            'dirs': [list(stamp) for stamp in dir_stamps],
+            'inputs': [[path, list(stamp) if stamp is not None else None] for path, stamp in inputs],
+            'written_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.updated.add(key)
+
+    def save(self) -> None:
+        """디스크의 최신 매니페스트에 이번 실행에서 갱신한 항목만 덮어써 원자적으로 저장"""
+        if not self.updated:
+            return
+        latest = SummaryManifest(self.path).entries
+        for key in self.updated:
+            latest[key] = self.entries[key]
+        _atomic_write(self.path, lambda f: json.dump({'version': MANIFEST_VERSION, 'outputs': latest},
+                                                     f, ensure_ascii=False))
+        self.updated.clear()
+
+
+def manifest_params(roots: List[Tuple[str, Path]], options: Dict[str, Any],
+                    include_projects: List[str] = None, exclude_projects: List[str] = None,
+                    output: str = 'daily') -> Dict[str, Any]:
+    """결과에 영향을 주는 분석 옵션 (병렬도 등 결과와 무관한 옵션은 제외)
+
+    output은 저장 파일 형태 (daily: 하루 dict, range: 일자별 배열, weekly: 기간 합산 dict, ndjson: 일자별 줄).
+    같은 경로에 다른 형태로 저장한 결과를 재사용하지 않도록 함께 기록.
+    """
+    params = {
+        'output': output,
+        'roots': [[label, str(path)] for label, path in roots],
+        'project': include_projects or [],
+        'exclude_project': exclude_projects or [],
+        'sample': options.get('sample_rate'),
+        'max_sessions': options.get('max_sessions'),
+        'seed': options.get('seed') if options.get('sample_rate') or options.get('max_sessions') else None,
+    }
+    if options.get('sections'):
+        # 전체 리포트의 기존 매니페스트 항목이 무효화되지 않도록 부분 리포트일 때만 기록
+        params['sections'] = list(options['sections'])
+    return params
+
+
+def reuse_saved_output(manifest: Optional[SummaryManifest], json_path: Optional[str],
+                       roots: List[Tuple[str, Path]], params: Dict[str, Any], span: Tuple[str, str],
+                       verbose: bool = True) -> Optional[Any]:
+    """입력이 바뀌지 않은 저장 결과가 있으면 읽어서 반환 (없거나 바뀌었거나 읽을 수 없으면 None)"""
+    if manifest is None or not json_path or not manifest.is_fresh(json_path, roots, params, span):
+        return None
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if verbose:
+        print(f"입력 변경 없음, 기존 결과 재사용: {json_path}", file=sys.stderr)
+    return result
 
 
-def get_json_output_path(output_option: str, date_str: str, end_date_str: str = None, weekly: bool = False) -> str:
+def get_json_output_path(output_option: str, date_str: str, end_date_str: str = None, weekly: bool = False,
+                         ndjson: bool = False) -> str:
     """JSON 출력 경로 결정"""
     base_dir = os.path.expanduser('~/.claude/summaries')
 
@@ -1804,7 +4143,7 @@ def get_json_output_path(output_option: str, date_str: str, end_date_str: str =
         elif end_date_str and date_str != end_date_str:
             # 기간 분석
             sub_dir = os.path.join(base_dir, 'range')
-            filename = f"{date_str}_to_{end_date_str}.json"
+            filename = f"{date_str}_to_{end_date_str}.{'ndjson' if ndjson else 'json'}"
         else:
             # 단일 날짜
             sub_dir = os.path.join(base_dir, 'daily')
@@ -1815,99 +4154,687 @@ def get_json_output_path(output_option: str, date_str: str, end_date_str: str =
         return output_option
 
 
+def _atomic_write(path: str, write) -> None:
+    """같은 디렉토리의 임시 파일에 write(f)로 쓴 뒤 rename (중단돼도 기존 파일이 깨지지 않음)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def save_json_output(result: Any, json_path: str) -> None:
     """JSON 결과를 파일로 저장"""
-    os.makedirs(os.path.dirname(json_path), exist_ok=True)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    _atomic_write(json_path, lambda f: json.dump(result, f, ensure_ascii=False, indent=2))
+    _mem_checkpoint('serialization')
     print(f"JSON 저장: {json_path}", file=sys.stderr)
 
 
+def stream_ndjson_output(results, json_path: str = None) -> int:
+    """결과를 한 줄짜리 JSON으로 계산되는 즉시 stdout(및 파일)에 기록. 기록한 줄 수 반환
+
+    파일은 임시 파일에 기록한 뒤 모두 끝나면 rename하므로 중간에 중단돼도 기존 파일이 남음.
+    """
+    out = None
+    tmp_path = None
+    if json_path:
+        os.makedirs(os.path.dirname(json_path) or '.', exist_ok=True)
+        tmp_path = f'{json_path}.{os.getpid()}.tmp'
+        out = open(tmp_path, 'w', encoding='utf-8')
+    count = 0
+    completed = False
+    try:
+        for result in results:
+            line = json.dumps(result, ensure_ascii=False, separators=(',', ':')) + '\n'
+            _mem_checkpoint('serialization')
+            sys.stdout.write(line)
+            sys.stdout.flush()
+            if out:
+                out.write(line)
+                out.flush()
+            count += 1
+        completed = True
+    finally:
+        if out:
+            out.close()
+            if completed and count:
+                os.replace(tmp_path, json_path)
+                print(f"NDJSON 저장: {json_path}", file=sys.stderr)
+            else:
+                os.remove(tmp_path)
+    return count
+
+
+# ============================================================================
+# Section 5.5: Report Server (serve 모드)
+# ============================================================================
+
+TREND_DEFAULT_DAYS = 14
+
+
+class ResultCache:
+    """입력 파일 지문으로 무효화되는 분석 결과 LRU 캐시
+
+    세션 날짜는 첫 기록 시각이라 범위 밖 파일이 나중에 범위로 들어올 수 없으므로, 대상 세션 파일의
+    크기·mtime(기록 추가)이 같고 mtime이 바뀐 프로젝트 디렉토리의 새 파일 중 범위에 드는 세션이 없으면 유효.
+    조회 시 stat만 다시 하고, 새 파일이 생긴 디렉토리에서만 처음 보는 파일의 첫 기록을 읽음.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, roots: List[Tuple[str, Path]], start: datetime, end: datetime,
+            include_projects: List[str] = None, exclude_projects: List[str] = None) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return None
+        dir_stamps, file_stamps, value = entry
+        if not _span_inputs_unchanged(roots, dir_stamps, file_stamps, start, end,
+                                      include_projects, exclude_projects):
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        return value
+
+    def put(self, key, dir_stamps: Tuple, file_stamps: List[Tuple[str, Any]], value: Dict[str, Any]) -> None:
+        with self.lock:
+            self.entries[key] = (dir_stamps, file_stamps, value)
+            self.entries.move_to_end(key)
+            self.misses += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'entries': len(self.entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class ReportService:
+    """serve 모드의 기간별 분석 + 결과 캐시"""
+
+    def __init__(self, roots: List[Tuple[str, Path]], cache_size: int = 128, workers: int = 1,
+                 include_projects: List[str] = None, exclude_projects: List[str] = None):
+        self.roots = roots
+        self.cache = ResultCache(cache_size)
+        self.workers = workers
+        self.include_projects = include_projects
+        self.exclude_projects = exclude_projects
+
+    def analyze(self, start_str: str, end_str: str) -> Tuple[Dict[str, Any], bool]:
+        """start~end 분석 결과와 캐시 적중 여부. 에러는 {'error': ...} 형태로 반환"""
+        key = (start_str, end_str)
+        start, end = _day_span(start_str, end_str)
+        cached = self.cache.get(key, self.roots, start, end, self.include_projects, self.exclude_projects)
+        if cached is not None:
+            return cached, True
+
+        # 디렉토리 지문은 발견 전에 떠 두어야 분석 중 추가된 파일이 다음 조회에서 감지됨
+        dir_stamps = _directory_stamps(self.roots)
+        collected = collect_root_sessions(self.roots, start, end, self.include_projects,
+                                          self.exclude_projects, workers=self.workers)
+        file_stamps = [stamp for entry in collected for stamp in entry['inputs']]
+        result, error, found = _analyze_root_collections(collected, start, end)
+        if error:
+            result = {'date_range': {'start': start_str, 'end': end_str}, 'error': error, 'sessions_found': found}
+        self.cache.put(key, dir_stamps, file_stamps, result)
+        return result, False
+
+    def trend(self, start_str: str, end_str: str) -> Tuple[Dict[str, Any], bool]:
+        """일자별 핵심 지표 추이 (일자별 결과는 /daily와 같은 캐시 항목 재사용)"""
+        current = datetime.strptime(start_str, '%Y-%m-%d')
+        end = datetime.strptime(end_str, '%Y-%m-%d')
+        days = []
+        all_cached = True
+        while current <= end:
+            date_str = current.strftime('%Y-%m-%d')
+            result, cached = self.analyze(date_str, date_str)
+            all_cached = all_cached and cached
+            if 'error' in result:
+                days.append({'date': date_str, 'sessions': 0})
+            else:
+                days.append({
+                    'date': date_str,
+                    'sessions': result['summary']['sessions'],
+                    'score': result['scoring']['total'],
+                    'grade': result['scoring']['grade'],
+                    'error_rate': result['error_summary']['rate'],
+                    'total_tokens': result['token_usage']['totals']['total_tokens'],
+                    'cache_hit_ratio': result['token_usage']['totals']['cache_hit_ratio'],
+                    'avg_tool_calls': result['summary']['avg_tool_calls'],
+                    'turn_latency_p50': result['turn_timing']['turn_latency']['p50'],
+                })
+            current += timedelta(days=1)
+        return {'start': start_str, 'end': end_str, 'days': days}, all_cached
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    """GET /daily/<date>, /range?start=&end=, /trend[?start=&end=], /cache"""
+
+    service: ReportService = None
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if len(parts) == 2 and parts[0] == 'daily':
+                _validate_date_range(parts[1], parts[1])
+                body, cached = self.service.analyze(parts[1], parts[1])
+            elif parts == ['range']:
+                if 'start' not in query or 'end' not in query:
+                    raise ValueError('start와 end 쿼리 파라미터가 필요합니다')
+                _validate_date_range(query['start'], query['end'])
+                body, cached = self.service.analyze(query['start'], query['end'])
+            elif parts == ['trend']:
+                end_str = query.get('end') or datetime.now().strftime('%Y-%m-%d')
+                start_str = query.get('start') or (
+                    datetime.strptime(end_str, '%Y-%m-%d') - timedelta(days=TREND_DEFAULT_DAYS - 1)
+                ).strftime('%Y-%m-%d')
+                _validate_date_range(start_str, end_str)
+                body, cached = self.service.trend(start_str, end_str)
+            elif parts == ['cache']:
+                self._send_json(200, self.service.cache.stats())
+                return
+            else:
+                self._send_json(404, {'error': f'알 수 없는 경로: {url.path}'})
+                return
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # 분석 중 예외가 나도 연결을 그냥 끊지 않고 JSON 에러로 응답
+            print(f"요청 처리 실패 ({self.path}): {e!r}", file=sys.stderr)
+            self._send_json(500, {'error': f'내부 오류: {type(e).__name__}: {e}'})
+            return
+        status = 404 if 'error' in body else 200
+        self._send_json(status, body, {'X-Cache': 'hit' if cached else 'miss',
+                                       'X-Elapsed-Ms': f'{(time.perf_counter() - started) * 1000:.1f}'})
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _validate_date_range(start_str: str, end_str: str) -> None:
+    """YYYY-MM-DD 형식과 start <= end 검사 (위반 시 ValueError)"""
+    start = datetime.strptime(start_str, '%Y-%m-%d')
+    end = datetime.strptime(end_str, '%Y-%m-%d')
+    if start > end:
+        raise ValueError(f'start({start_str})가 end({end_str})보다 늦습니다')
+
+
+def serve_reports(roots: List[Tuple[str, Path]], port: int, cache_size: int = 128, workers: int = 1,
+                  include_projects: List[str] = None, exclude_projects: List[str] = None) -> None:
+    """localhost에서 분석 결과를 JSON으로 제공하는 HTTP 서버 실행 (Ctrl+C로 종료)"""
+    handler = type('BoundReportRequestHandler', (ReportRequestHandler,), {
+        'service': ReportService(roots, cache_size, workers, include_projects, exclude_projects),
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    print(f"리포트 서버: http://127.0.0.1:{server.server_address[1]} "
+          f"(/daily/<date>, /range?start=&end=, /trend, /cache)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ============================================================================
+# Section 5.6: Backfill (체크포인트 기반 일괄 분석)
+# ============================================================================
+
+BACKFILL_CHECKPOINT_VERSION = 1
+# 체크포인트/매니페스트 저장 최소 간격 (초). 중단 시에도 finally에서 저장
+BACKFILL_SAVE_INTERVAL = 2.0
+BACKFILL_TOTAL_FIELDS = ('sessions', 'tool_calls', 'tool_errors', 'total_tokens', 'output_tokens', 'score_sum')
+
+
+def _backfill_row(result: Dict[str, Any]) -> Dict[str, int]:
+    """일자별 결과에서 기간 합산용 지표 추출"""
+    totals = result['token_usage']['totals']
+    return {
+        'sessions': result['summary']['sessions'],
+        'tool_calls': result['parallel_calls']['total_calls'],
+        'tool_errors': result['error_summary']['total'],
+        'total_tokens': totals['total_tokens'],
+        'output_tokens': totals['output_tokens'],
+        'score_sum': result['scoring']['total'],
+    }
+
+
+def _backfill_day(date_str: str, roots: List[Tuple[str, Path]], options: Dict[str, Any],
+                  json_path: Optional[str]) -> Dict[str, Any]:
+    """하루 분석 + 저장 (프로세스 풀 워커). 매니페스트 기록은 부모 프로세스가 담당"""
+    dir_stamps = _directory_stamps(roots)
+    inputs = []
+    result = analyze_date(date_str, roots, inputs=inputs, **options)
+    if 'error' in result:
+        return {'date': date_str, 'status': 'empty', 'row': None}
+    if json_path:
+        _atomic_write(json_path, lambda f: json.dump(result, f, ensure_ascii=False, indent=2))
+    return {'date': date_str, 'status': 'saved', 'row': _backfill_row(result),
+            'dir_stamps': dir_stamps, 'inputs': inputs}
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60:02d}s'
+    return f'{seconds}s'
+
+
+class BackfillCheckpoint:
+    """완료한 날짜와 부분 합계를 ~/.claude/summaries/.cache/backfill-START_END.json에 기록
+
+    날짜 완료와 합계 반영을 한 파일에 원자적으로 쓰므로, 중단 후 재개해도 같은 날짜가 두 번 합산되지 않음.
+    기간이나 분석 옵션이 다르면 이전 체크포인트는 버리고 처음부터 시작.
+    """
+
+    def __init__(self, start_str: str, end_str: str, params: Dict[str, Any], path: str = None):
+        self.path = path or os.path.expanduser(
+            f'~/.claude/summaries/.cache/backfill-{start_str}_{end_str}.json')
+        self.key = {'start': start_str, 'end': end_str, 'params': params,
+                    'analyzer': analyzer_version(), 'version': BACKFILL_CHECKPOINT_VERSION}
+        self.days = {}
+        self.totals = {field: 0 for field in BACKFILL_TOTAL_FIELDS}
+        self.days_with_sessions = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') == self.key:
+                self.days = data['days']
+                self.totals.update(data['totals'])
+                self.days_with_sessions = data['days_with_sessions']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def complete(self, date_str: str, status: str, row: Optional[Dict[str, int]]) -> None:
+        if date_str in self.days:
+            return
+        self.days[date_str] = status
+        if row:
+            self.days_with_sessions += 1
+            for field in BACKFILL_TOTAL_FIELDS:
+                self.totals[field] += row[field]
+
+    def save(self) -> None:
+        _atomic_write(self.path, lambda f: json.dump({
+            'key': self.key, 'days': self.days, 'totals': self.totals,
+            'days_with_sessions': self.days_with_sessions,
+        }, f, ensure_ascii=False))
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def run_backfill(start_str: str, end_str: str, roots: List[Tuple[str, Path]], options: Dict[str, Any],
+                 params: Dict[str, Any], manifest: Optional[SummaryManifest], save: bool = True,
+                 workers: int = 1) -> Dict[str, Any]:
+    """START~END를 하루 단위로 병렬 분석해 daily/<날짜>.json으로 저장
+
+    - 체크포인트에 완료된 날짜는 건너뛰고 (재개), 매니페스트상 입력이 그대로인 날짜는 저장된 결과만 읽음
+    - 진행률/처리량/ETA를 stderr에 출력하고, 끝나면 기간 합계를 반환
+    """
+    start = datetime.strptime(start_str, '%Y-%m-%d')
+    end = datetime.strptime(end_str, '%Y-%m-%d')
+    all_days = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)]
+    checkpoint = BackfillCheckpoint(start_str, end_str, params)
+    resumed = sum(1 for d in all_days if d in checkpoint.days)
+    if resumed:
+        print(f"체크포인트에서 재개: {resumed}/{len(all_days)}일 완료됨", file=sys.stderr)
+
+    day_options = dict(options, workers=1)
+    started = time.perf_counter()
+    last_save = last_report = started
+    processed = 0
+    processed_sessions = 0
+
+    def report(force: bool = False):
+        nonlocal last_report
+        now = time.perf_counter()
+        if not force and now - last_report < 1.0:
+            return
+        last_report = now
+        done = len(checkpoint.days)
+        elapsed = now - started
+        rate = processed / elapsed if elapsed > 0 else 0
+        remaining = len(all_days) - done
+        eta = _format_duration(remaining / rate) if rate and remaining else '-'
+        print(f"[{done}/{len(all_days)}] {done / len(all_days) * 100:.1f}% "
+              f"{rate:.2f}일/s, {processed_sessions / elapsed if elapsed > 0 else 0:.1f}세션/s, "
+              f"경과 {_format_duration(elapsed)}, ETA {eta}", file=sys.stderr)
+
+    def checkpoint_save(force: bool = False):
+        nonlocal last_save
+        now = time.perf_counter()
+        if force or now - last_save >= BACKFILL_SAVE_INTERVAL:
+            # 매니페스트를 먼저 저장해야 체크포인트에만 있는 날짜(매니페스트 누락)가 생기지 않음
+            if manifest is not None:
+                manifest.save()
+            checkpoint.save()
+            last_save = now
+
+    def finish_day(outcome: Dict[str, Any], json_path: Optional[str]):
+        nonlocal processed, processed_sessions
+        if outcome['status'] == 'saved' and manifest is not None and json_path:
+            manifest.record(json_path, outcome['dir_stamps'], outcome['inputs'], params,
+                            (outcome['date'], outcome['date']))
+        checkpoint.complete(outcome['date'], outcome['status'], outcome['row'])
+        processed += 1
+        processed_sessions += outcome['row']['sessions'] if outcome['row'] else 0
+        checkpoint_save()
+        report()
+
+    pending = {}
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint) if workers > 1 else None
+    try:
+        for date_str in all_days:
+            if date_str in checkpoint.days:
+                continue
+            json_path = get_json_output_path('auto', date_str) if save else None
+            saved = reuse_saved_output(manifest, json_path, roots, params, (date_str, date_str), verbose=False)
+            if saved is not None:
+                finish_day({'date': date_str, 'status': 'unchanged', 'row': _backfill_row(saved)}, json_path)
+            elif pool is None:
+                finish_day(_backfill_day(date_str, roots, day_options, json_path), json_path)
+            else:
+                pending[pool.submit(_backfill_day, date_str, roots, day_options, json_path)] = json_path
+        for future in as_completed(pending):
+            finish_day(future.result(), pending[future])
+    finally:
+        if pool is not None:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+        checkpoint_save(force=True)
+    report(force=True)
+
+    statuses = Counter(checkpoint.days.values())
+    totals = dict(checkpoint.totals)
+    score_sum = totals.pop('score_sum')
+    elapsed = time.perf_counter() - started
+    summary = {
+        'date_range': {'start': start_str, 'end': end_str},
+        'days': {
+            'total': len(all_days),
+            'saved': statuses.get('saved', 0),
+            'unchanged': statuses.get('unchanged', 0),
+            'empty': statuses.get('empty', 0),
+            'resumed': resumed,
+            'with_sessions': checkpoint.days_with_sessions,
+        },
+        'totals': totals,
+        'avg_daily_score': round(score_sum / checkpoint.days_with_sessions, 1) if checkpoint.days_with_sessions else 0,
+        'elapsed_seconds': round(elapsed, 2),
+        'days_per_second': round(processed / elapsed, 2) if elapsed > 0 else 0,
+    }
+    checkpoint.remove()
+    return summary
+
+
 def main():
     parser = argparse.ArgumentParser(description='Session Analyzer - JSONL 세션 로그 통합 분석')
     parser.add_argument('--date', type=str, help='분석할 날짜 (YYYY-MM-DD)')
     parser.add_argument('--date-range', nargs=2, metavar=('START', 'END'),
                         help='날짜 범위 (YYYY-MM-DD YYYY-MM-DD)')
-    parser.add_argument('--projects-dir', type=str,
-                        default=os.path.expanduser('~/.claude/projects'),
-                        help='프로젝트 디렉토리 (기본: ~/.claude/projects)')
+    parser.add_argument('--projects-dir', type=str, action='append', metavar='[LABEL=]DIR',
+                        help='프로젝트 디렉토리 (기본: ~/.claude/projects). 여러 번 지정하면 합산 결과와 '
+                             '루트별 결과(by_root)를 함께 출력')
     parser.add_argument('--output-json', type=str, default='auto',
                         help='JSON 저장 경로 (기본: "auto", 경로 직접 지정 가능)')
     parser.add_argument('--weekly', action='store_true',
                         help='주간 분석 모드: weekly/ 폴더에 YYYY-MM-WN.json 형식으로 저장')
     parser.add_argument('--no-save', action='store_true',
                         help='JSON 파일 저장 생략 (stdout 출력만)')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='--date-range 일자별 결과를 계산 즉시 한 줄씩 출력 (NDJSON 스트리밍, .ndjson 저장)')
+    parser.add_argument('--project', action='append', metavar='GLOB',
+                        help='분석할 프로젝트 디렉토리 이름 글롭 (반복 지정 가능, 예: "*my-repo*")')
+    parser.add_argument('--exclude-project', action='append', metavar='GLOB',
+                        help='제외할 프로젝트 디렉토리 이름 글롭 (반복 지정 가능)')
+    parser.add_argument('--sample', type=float, metavar='RATE',
+                        help='근사 분석: 프로젝트×날짜 층별로 세션 파일을 RATE 비율(0~1)만 표본 추출')
+    parser.add_argument('--max-sessions', type=int, metavar='N',
+                        help='근사 분석: 분석 단위(날짜/기간)당 최대 N개 세션만 층별 표본 추출')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='표본 추출 난수 시드 (기본: 0)')
+    parser.add_argument('--compact', type=str, metavar='DEST_DIR',
+                        help='세션 로그를 분석 전용 축약 아카이브로 DEST_DIR에 저장 (--date/--date-range로 대상 제한)')
+    parser.add_argument('--backfill', nargs=2, metavar=('START', 'END'),
+                        help='START~END를 하루 단위로 병렬 분석해 daily/에 저장 (중단 후 다시 실행하면 이어서 진행)')
+    parser.add_argument('--serve', action='store_true',
+                        help='localhost HTTP 서버로 실행 (/daily/<date>, /range?start=&end=, /trend)')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='--serve 포트 (기본: 8765)')
+    parser.add_argument('--cache-size', type=int, default=128,
+                        help='--serve 결과 캐시 항목 수 (기본: 128)')
+    parser.add_argument('--force', action='store_true',
+                        help='입력이 바뀌지 않았어도 다시 계산해 저장 (summaries/manifest.json 무시)')
+    parser.add_argument('--memprofile', action='store_true',
+                        help='tracemalloc으로 단계별(발견/파싱/점수/직렬화) 메모리와 세션당 보유 바이트, 상위 할당 위치를 stderr에 보고')
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help='병렬 프로세스 수 (기본: --backfill이거나 --projects-dir가 여러 개면 CPU 수, 아니면 1)')
+    parser.add_argument('--sections', type=str, metavar='NAME[,NAME...]',
+                        help=f"지정한 리포트 섹션만 계산 (파서도 해당 필드만 추출). 가능: {', '.join(REPORT_SECTIONS)}")
 
     args = parser.parse_args()
 
-    if args.date:
-        result = analyze_date(args.date, args.projects_dir)
-        if 'error' in result:
-            print(f"{result['error']}: {result['date']}", file=sys.stderr)
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error('--sample은 0보다 크고 1 이하여야 합니다')
+    if args.max_sessions is not None and args.max_sessions < 1:
+        parser.error('--max-sessions는 1 이상이어야 합니다')
+    if args.memprofile:
+        enable_memprofile()
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers는 1 이상이어야 합니다')
+    try:
+        roots = parse_projects_roots(args.projects_dir or [os.path.expanduser('~/.claude/projects')])
+    except ValueError as e:
+        parser.error(str(e))
+    sections = None
+    if args.sections is not None:
+        try:
+            sections = parse_sections(args.sections)
+        except ValueError as e:
+            parser.error(f'--sections: {e}')
+        if args.backfill or args.serve or args.compact:
+            parser.error('--sections는 --backfill, --serve, --compact와 함께 쓸 수 없습니다')
+    workers = args.workers or ((os.cpu_count() or 1) if args.backfill or len(roots) > 1 else 1)
+    options = {'sample_rate': args.sample, 'max_sessions': args.max_sessions, 'seed': args.seed,
+               'workers': workers, 'sections': sections}
+
+    # 저장하는 출력은 매니페스트로 입력 변경 여부를 확인해 변경이 없으면 재계산 생략
+    # 부분 리포트(--sections)는 기본 경로(auto)의 전체 요약을 덮어쓰지 않도록 명시 경로일 때만 저장
+    saving = bool(args.output_json) and not args.no_save and not (sections and args.output_json == 'auto')
+    manifest = SummaryManifest(force=args.force) if saving else None
+    if args.date_range and args.weekly:
+        output_shape = 'weekly'
+    elif args.date_range:
+        output_shape = 'ndjson' if args.ndjson else 'range'
+    else:
+        output_shape = 'daily'
+    params = manifest_params(roots, options, args.project, args.exclude_project, output_shape)
+
+    if args.backfill:
+        try:
+            _validate_date_range(*args.backfill)
+        except ValueError as e:
+            parser.error(f'--backfill: {e}')
+        day_options = dict(options, include_projects=args.project, exclude_projects=args.exclude_project)
+        try:
+            summary = run_backfill(args.backfill[0], args.backfill[1], roots, day_options,
+                                   params, manifest, save=saving, workers=workers)
+        except KeyboardInterrupt:
+            print("\n중단됨: 완료한 날짜는 체크포인트에 저장되었습니다. 같은 명령으로 다시 실행하면 이어서 진행합니다.",
+                  file=sys.stderr)
+            sys.exit(130)
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+    elif args.serve:
+        serve_reports(roots, args.port, args.cache_size, workers, args.project, args.exclude_project)
+
+    elif args.compact:
+        if len(roots) > 1:
+            parser.error('--compact는 --projects-dir 하나만 지원합니다')
+        projects_dir = roots[0][1]
+        if args.date or args.date_range:
+            start_str, end_str = args.date_range or (args.date, args.date)
+            start = datetime.strptime(start_str, '%Y-%m-%d')
+            end = datetime.strptime(end_str, '%Y-%m-%d').replace(hour=23, minute=59, second=59, microsecond=999999)
+            files = find_session_files(projects_dir, start, end, args.project, args.exclude_project)
+        else:
+            files = sorted(
+                p for d in projects_dir.iterdir()
+                if d.is_dir() and project_matches(d.name, args.project, args.exclude_project)
+                for p in d.glob('*.jsonl')
+            )
+
+        summary = compact_sessions(files, projects_dir, Path(args.compact))
+        print(f"축약 완료: {summary['verified']}/{summary['files']}개 검증, "
+              f"{summary['bytes_before']:,} → {summary['bytes_after']:,} bytes ({summary['ratio']}x)",
+              file=sys.stderr)
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        if summary['mismatched']:
             sys.exit(1)
 
+    elif args.date:
         # JSON 저장 (기본: auto, --no-save로 생략 가능)
-        if args.output_json and not args.no_save:
-            json_path = get_json_output_path(args.output_json, args.date)
-            save_json_output(result, json_path)
+        json_path = get_json_output_path(args.output_json, args.date) if saving else None
+        result = reuse_saved_output(manifest, json_path, roots, params, (args.date, args.date))
+        if result is None:
+            dir_stamps = _directory_stamps(roots)
+            inputs = []
+            result = analyze_date(args.date, roots, args.project, args.exclude_project,
+                                  inputs=inputs, **options)
+            if 'error' in result:
+                print(f"{result['error']}: {result['date']}", file=sys.stderr)
+                sys.exit(1)
+            if json_path:
+                save_json_output(result, json_path)
+                manifest.record(json_path, dir_stamps, inputs, params, (args.date, args.date))
 
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        print(serialize_result(result))
 
     elif args.date_range:
         if args.weekly:
             # --weekly: 전체 기간을 하나로 합산한 단일 결과
-            result = analyze_date_range(args.date_range[0], args.date_range[1], args.projects_dir)
-
-            if 'error' in result:
-                print(f"{result['error']}: {args.date_range[0]} ~ {args.date_range[1]}", file=sys.stderr)
-                sys.exit(1)
-
-            if args.output_json and not args.no_save:
+            json_path = None
+            if saving:
                 json_path = get_json_output_path(
                     args.output_json,
                     args.date_range[0],
                     args.date_range[1],
                     weekly=True
                 )
-                save_json_output(result, json_path)
+            result = reuse_saved_output(manifest, json_path, roots, params, args.date_range)
+            if result is None:
+                dir_stamps = _directory_stamps(roots)
+                inputs = []
+                result = analyze_date_range(args.date_range[0], args.date_range[1], roots,
+                                            args.project, args.exclude_project, inputs=inputs, **options)
 
-            print(json.dumps(result, ensure_ascii=False, indent=2))
+                if 'error' in result:
+                    print(f"{result['error']}: {args.date_range[0]} ~ {args.date_range[1]}", file=sys.stderr)
+                    sys.exit(1)
 
-        else:
-            # 기본: 일자별 개별 결과 배열
-            start = datetime.strptime(args.date_range[0], '%Y-%m-%d')
-            end = datetime.strptime(args.date_range[1], '%Y-%m-%d')
-
-            all_sessions_data = []
-            current = start
-            while current <= end:
-                date_str = current.strftime('%Y-%m-%d')
-                result = analyze_date(date_str, args.projects_dir)
-                if 'error' not in result:
-                    all_sessions_data.append(result)
-                else:
-                    print(f"  {date_str}: {result.get('error', '?')}", file=sys.stderr)
-                current += timedelta(days=1)
+                if json_path:
+                    save_json_output(result, json_path)
+                    manifest.record(json_path, dir_stamps, inputs, params, args.date_range)
 
-            if not all_sessions_data:
-                print("선택한 기간에 유효한 세션이 없습니다.", file=sys.stderr)
-                sys.exit(1)
+            print(serialize_result(result))
 
-            if args.output_json and not args.no_save:
+        else:
+            # 기본: 일자별 개별 결과 배열
+            json_path = None
+            if saving:
                 json_path = get_json_output_path(
                     args.output_json,
                     args.date_range[0],
                     args.date_range[1],
-                    weekly=False
+                    weekly=False,
+                    ndjson=args.ndjson,
                 )
+            if args.ndjson:
+                saved = None
+                if manifest is not None and manifest.is_fresh(json_path, roots, params, args.date_range):
+                    try:
+                        with open(json_path, 'r', encoding='utf-8') as f:
+                            saved = f.read()
+                    except OSError:
+                        pass
+                if saved is not None:
+                    print(f"입력 변경 없음, 기존 결과 재사용: {json_path}", file=sys.stderr)
+                    sys.stdout.write(saved)
+                    return
+            else:
+                saved = reuse_saved_output(manifest, json_path, roots, params, args.date_range)
+                if saved is not None:
+                    print(serialize_result(saved))
+                    return
+
+            dir_stamps = _directory_stamps(roots)
+            inputs = []
+            daily_results = iter_daily_results(
+                args.date_range[0], args.date_range[1], roots,
+                include_projects=args.project, exclude_projects=args.exclude_project,
+                inputs=inputs, **options,
+            )
+
+            if args.ndjson:
+                # --ndjson: 하루 결과를 계산 즉시 한 줄씩 출력/저장 (메모리에 누적하지 않음)
+                if not stream_ndjson_output(daily_results, json_path):
+                    print("선택한 기간에 유효한 세션이 없습니다.", file=sys.stderr)
+                    sys.exit(1)
+                if json_path:
+                    manifest.record(json_path, dir_stamps, inputs, params, args.date_range)
+                    manifest.save()
+                return
+
+            all_sessions_data = list(daily_results)
+
+            if not all_sessions_data:
+                print("선택한 기간에 유효한 세션이 없습니다.", file=sys.stderr)
+                sys.exit(1)
+
+            if json_path:
                 save_json_output(all_sessions_data, json_path)
+                manifest.record(json_path, dir_stamps, inputs, params, args.date_range)
 
-            print(json.dumps(all_sessions_data, ensure_ascii=False, indent=2))
+            print(serialize_result(all_sessions_data))
 
     else:
         parser.print_help()
         sys.exit(1)
 
+    if manifest is not None:
+        manifest.save()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Session Analyzer 마이크로벤치마크
+
+analyze_sessions.py의 핫 패스를 이전 구현과 비교합니다.
+
+사용법:
+    python3 benchmarks.py
+    python3 benchmarks.py --iterations 200000
+"""
+
+import argparse
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import analyze_sessions  # noqa: E402
+
+
+def _legacy_parse_timestamp(timestamp_str: str) -> datetime:
+    """최적화 이전 parse_timestamp (strptime 순차 시도)"""
+    try:
+        for fmt in [
+            "%Y-%m-%dT%H:%M:%S.%fZ",
+            "%Y-%m-%dT%H:%M:%SZ",
+            "%Y-%m-%dT%H:%M:%S.%f%z",
+            "%Y-%m-%dT%H:%M:%S%z",
+        ]:
+            try:
+                return datetime.strptime(timestamp_str, fmt)
+            except ValueError:
+                continue
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except Exception:
+        return datetime.now()
+
+
+def _sample_timestamps(n: int) -> list:
+    base = datetime(2026, 2, 11, 9, 0, 0)
+    return [
+        (base + timedelta(milliseconds=i * 1337)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        for i in range(n)
+    ]
+
+
+def bench_parse_timestamp(iterations: int) -> dict:
+    """parse_timestamp: 이전 구현 vs 고정 위치 파서 (캐시 미스/적중)"""
+    samples = _sample_timestamps(min(iterations, 50000))
+    for s in samples[:1000]:
+        assert analyze_sessions.parse_timestamp(s) == _legacy_parse_timestamp(s), s
+    rounds = max(1, iterations // len(samples))
+
+    def run_legacy():
+        for s in samples:
+            _legacy_parse_timestamp(s)
+
+    def run_uncached():
+        for s in samples:
+            analyze_sessions._parse_timestamp_str.__wrapped__(s)
+
+    def run_cached():
+        for s in samples:
+            analyze_sessions.parse_timestamp(s)
+
+    analyze_sessions._parse_timestamp_str.cache_clear()
+    run_cached()  # 캐시 채우기
+    calls = rounds * len(samples)
+    results = {
+        'legacy': timeit.timeit(run_legacy, number=rounds),
+        'fast': timeit.timeit(run_uncached, number=rounds),
+        'fast_cached': timeit.timeit(run_cached, number=rounds),
+    }
+    return {name: secs / calls * 1e9 for name, secs in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session Analyzer 마이크로벤치마크')
+    parser.add_argument('--iterations', type=int, default=100000,
+                        help='벤치마크 호출 횟수 (기본: 100000)')
+    args = parser.parse_args()
+
+    ns = bench_parse_timestamp(args.iterations)
+    print('parse_timestamp (ns/call)')
+    for name, value in ns.items():
+        print(f"  {name:<12} {value:>10.0f}  ({ns['legacy'] / value:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
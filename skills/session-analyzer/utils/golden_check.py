@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Session Analyzer 골든 출력 동등성 검사
+
+시드가 고정된 합성 코퍼스로 세 가지를 확인합니다.
+
+1. 원래 구현과의 일치: 최적화 이전 구현이 같은 코퍼스에서 낸 출력(golden_baseline.json)의 모든 필드가
+   현재 출력에서 같은 값인지. 의도한 동작 변경은 BASELINE_CHANGES에 이유와 함께 적은 필드만 허용.
+2. 경로 간 일치: 현재 코드의 단일 프로세스·전체 필드 파싱 경로를 기준으로, 최적화 경로(병렬 파싱,
+   다중 루트, 결과 캐시, NDJSON 스트리밍, 축약 아카이브, --sections, 병렬 backfill)의 JSON이
+   바이트 단위로 같은지. 기준 자체가 현재 코드이므로 이 단계는 경로끼리 서로 맞는지만 보장함.
+3. 회귀: 기준 출력의 해시와 단계별(발견/파싱/점수 계산/직렬화) 시간·메모리 예산을
+   golden_outputs.json과 비교.
+
+사용법:
+    python3 golden_check.py
+    python3 golden_check.py --update-golden        # 의도한 출력/성능 변경 후 기준 갱신
+    python3 golden_check.py --skip-budgets --keep-corpus /tmp/golden-corpus
+
+종료 코드: 0 통과, 1 출력 불일치 또는 예산 초과
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import analyze_sessions  # noqa: E402
+
+GOLDEN_VERSION = 1
+DEFAULT_GOLDEN = Path(__file__).resolve().parent / 'golden_outputs.json'
+# 최적화 이전 구현의 출력 (한 번 기록해 두고 현재 코드로는 다시 만들지 않음)
+BASELINE_OUTPUTS = Path(__file__).resolve().parent / 'golden_baseline.json'
+# 원래 구현과 값이 달라도 되는 필드 (키 경로 → 이유)
+BASELINE_CHANGES = {
+    ('error_summary', 'recovery', 'alternative'):
+        '재시도는 3호출 이내 같은 도구·유사 입력 (원래는 바로 다음 호출이 같은 도구면 재시도)',
+}
+CORPUS_SEED = 2026
+CORPUS_START = '2026-02-01'
+CORPUS_DAYS = 5
+CORPUS_PROJECTS = ('-Users-dev-api', '-Users-dev-web', '-Users-dev-infra', '-Users-dev-docs')
+# 다중 루트 검사용 분할 (라벨 → 프로젝트)
+ROOT_SPLIT = {'alice': CORPUS_PROJECTS[:2], 'bob': CORPUS_PROJECTS[2:]}
+STAGES = ('discovery', 'parse', 'scoring', 'serialization')
+# 수 ms 단위 단계가 측정 잡음으로 실패하지 않도록 시간 예산에 더하는 최소 여유(초)
+TIME_BUDGET_FLOOR = 0.05
+
+PROMPTS = [
+    'react 컴포넌트 구현해줘',
+    '에러 고쳐',
+    '다시 해줘 아니 그게 아니라 반대로',
+    '## 계획\n1. 테스트 작성\n2. 리팩토링\n3. 커밋',
+    '완료 커밋해줘',
+    'python 스크립트 src/app.py 수정해줘 error 500 발생 http://localhost:3000',
+    '/compact',
+    '<command-name>/demo</command-name>',
+    '<command-name>/ship</command-name>',
+    '<command-name>/model</command-name>',
+    'docker 배포 설정 확인하고 /review 해줘',
+    'ok',
+]
+MODELS = ('claude-opus-4', 'claude-sonnet-4')
+SKILL_WORDS = '캐시 무효화 파서 성능 세션 요약 통계 에러 재시도 설정 문서 예시 규칙 워크플로우 리포트'.split()
+
+
+def _prose(rnd: random.Random, lines: int) -> str:
+    return '\n'.join(f"- {' '.join(rnd.sample(SKILL_WORDS, 3))} {rnd.choice(['추가', '수정', '정리함'])}"
+                     for _ in range(lines))
+
+
+def _markdown(rnd: random.Random, sections: int) -> str:
+    return '\n\n'.join(f"## {' '.join(rnd.sample(SKILL_WORDS, 2))}\n{_prose(rnd, rnd.randint(2, 6))}\n"
+                       "```bash\necho done\n```" for _ in range(sections))
+
+
+def _tool_input(rnd: random.Random, name: str, project: str) -> dict:
+    """도구별 입력 (설정 파일 편집, 반복 Read/Bash 등 분석 경로를 골고루 포함)"""
+    src = f'/Users/dev/{project}/src/mod{rnd.randint(0, 3)}.py'
+    if name == 'Read':
+        return {'file_path': src}
+    if name == 'Grep':
+        return {'pattern': rnd.choice(['TODO', 'def main', 'import']), 'path': '.'}
+    if name == 'Glob':
+        return {'pattern': '**/*.py'}
+    if name == 'Bash':
+        return {'command': rnd.choice(['npm test', 'pytest -q', 'git commit -m "wip"', 'cat src/app.py', 'ls'])}
+    if name == 'Edit':
+        target = rnd.choice([src, src, '/Users/dev/.claude/skills/demo/SKILL.md', f'/Users/dev/{project}/CLAUDE.md',
+                             '/Users/dev/.claude/skills/demo/utils/tool.py'])
+        if target.endswith('.md'):
+            return {'file_path': target, 'old_string': _markdown(rnd, 1), 'new_string': _markdown(rnd, 2)}
+        name_ = rnd.choice(['load', 'merge', 'scan'])
+        return {'file_path': target, 'old_string': 'x = 1\n',
+                'new_string': f'def {name_}_{rnd.randint(0, 9)}(x):\n    """{" ".join(rnd.sample(SKILL_WORDS, 2))} 처리"""\n    return x\n'}
+    if name == 'Write':
+        return {'file_path': rnd.choice([f'/Users/dev/{project}/docs/note.md', '/Users/dev/.claude/commands/ship.md']),
+                'content': f'# 제목\n{_markdown(rnd, 2)}\n'}
+    if name == 'Task':
+        return {'subagent_type': rnd.choice(['Explore', 'Plan']), 'description': '코드베이스 탐색', 'prompt': '구조 파악'}
+    if name == 'Skill':
+        return {'skill': 'demo'}
+    return {}
+
+
+def _session_records(rnd: random.Random, project: str, start: datetime) -> list:
+    t = start
+    context = 8000
+    model = rnd.choice(MODELS)
+    records = []
+
+    def stamp():
+        return t.strftime('%Y-%m-%dT%H:%M:%S.') + f'{t.microsecond // 1000:03d}Z'
+
+    for _ in range(rnd.randint(2, 9)):
+        records.append({'type': 'user', 'timestamp': stamp(),
+                        'message': {'role': 'user', 'content': rnd.choice(PROMPTS)}})
+        if rnd.random() < 0.1:
+            model = rnd.choice(MODELS)
+        for _ in range(rnd.randint(1, 4)):
+            t += timedelta(seconds=rnd.randint(1, 40))
+            items = []
+            if rnd.random() < 0.3:
+                items.append({'type': 'thinking', 'thinking': '접근 방법을 정리한다. ' * 5})
+            calls = []
+            for _ in range(rnd.choice([1, 1, 1, 2, 3])):
+                name = rnd.choice(['Read', 'Read', 'Grep', 'Glob', 'Bash', 'Bash', 'Edit', 'Edit', 'Write', 'Task', 'Skill'])
+                tool_id = f'toolu_{rnd.getrandbits(48):012x}'
+                calls.append(tool_id)
+                items.append({'type': 'tool_use', 'id': tool_id, 'name': name, 'input': _tool_input(rnd, name, project)})
+            context += rnd.randint(1000, 12000)
+            if context > 160000:
+                records.append({'type': 'system', 'subtype': 'compact_boundary', 'timestamp': stamp(),
+                                'compactMetadata': {'trigger': 'auto', 'preTokens': context}})
+                context = 20000
+            records.append({'type': 'assistant', 'timestamp': stamp(), 'message': {
+                'model': model, 'id': f'msg_{rnd.getrandbits(32):08x}', 'content': items,
+                'usage': {'input_tokens': rnd.randint(1, 60), 'cache_creation_input_tokens': rnd.randint(0, 4000),
+                          'cache_read_input_tokens': context, 'output_tokens': rnd.randint(20, 900)}}})
+            results = []
+            for tool_id in calls:
+                t += timedelta(milliseconds=rnd.randint(50, 15000))
+                failed = rnd.random() < 0.15
+                body = rnd.choice(['Error: no such file or directory', 'Error: command failed with exit code 1',
+                                   'permission denied']) if failed else 'output line\n' * rnd.randint(1, 300)
+                if rnd.random() < 0.3:
+                    body = [{'type': 'text', 'text': body}]
+                results.append({'type': 'tool_result', 'tool_use_id': tool_id, 'content': body, 'is_error': failed})
+            records.append({'type': 'user', 'timestamp': stamp(), 'message': {'role': 'user', 'content': results}})
+        t += timedelta(seconds=rnd.randint(3, 30))
+        records.append({'type': 'assistant', 'timestamp': stamp(), 'message': {
+            'model': model, 'content': [{'type': 'text', 'text': '완료했습니다.'}],
+            'usage': {'input_tokens': 4, 'cache_creation_input_tokens': 0, 'cache_read_input_tokens': context,
+                      'output_tokens': 30}}})
+        t += timedelta(minutes=rnd.randint(1, 45))
+    return records
+
+
+def build_corpus(projects_dir: Path) -> int:
+    """시드 고정 합성 코퍼스 생성. 생성한 세션 파일 수 반환
+
+    도구 호출이 없는 세션과 깨진 JSON 줄도 섞어 유효 세션 필터와 파싱 예외 경로를 함께 검사.
+    """
+    rnd = random.Random(CORPUS_SEED)
+    base = datetime.strptime(CORPUS_START, '%Y-%m-%d').replace(hour=8)
+    count = 0
+    for project in CORPUS_PROJECTS:
+        project_dir = projects_dir / project
+        project_dir.mkdir(parents=True, exist_ok=True)
+        for day in range(CORPUS_DAYS):
+            for _ in range(rnd.randint(1, 3)):
+                start = base + timedelta(days=day, hours=rnd.randint(0, 12), minutes=rnd.randint(0, 59))
+                records = _session_records(rnd, project, start)
+                with open(project_dir / f'{rnd.getrandbits(64):016x}.jsonl', 'w', encoding='utf-8') as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    if rnd.random() < 0.2:
+                        f.write('{"type": "user", "message": \n')
+                count += 1
+        with open(project_dir / f'{rnd.getrandbits(64):016x}.jsonl', 'w', encoding='utf-8') as f:
+            stamp = (base + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            f.write(json.dumps({'type': 'user', 'timestamp': stamp,
+                                'message': {'role': 'user', 'content': '질문만 하고 종료'}}, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def build_home(home: Path) -> None:
+    """스킬/커스텀 커맨드 레지스트리가 고정되도록 격리된 HOME 구성"""
+    skill_dir = home / '.claude' / 'skills' / 'demo'
+    skill_dir.mkdir(parents=True, exist_ok=True)
+    (skill_dir / 'SKILL.md').write_text(
+        '---\nname: demo\ndescription: 데모 스킬입니다. 골든 검사용으로 사용합니다.\n---\n\n# Demo\n', encoding='utf-8')
+    commands_dir = home / '.claude' / 'commands'
+    commands_dir.mkdir(parents=True, exist_ok=True)
+    (commands_dir / 'ship.md').write_text('배포 커맨드\n', encoding='utf-8')
+
+
+def _dump(value) -> str:
+    """CLI 출력/저장 파일과 같은 직렬화"""
+    return json.dumps(value, ensure_ascii=False, indent=2)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _days():
+    start = datetime.strptime(CORPUS_START, '%Y-%m-%d')
+    return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(CORPUS_DAYS)]
+
+
+def _first_difference(expected: str, actual: str) -> str:
+    for number, (a, b) in enumerate(zip(expected.splitlines(), actual.splitlines()), 1):
+        if a != b:
+            return f'{number}번째 줄: 기대 {a.strip()[:70]!r} / 실제 {b.strip()[:70]!r}'
+    return f'길이 다름: 기대 {len(expected)}자 / 실제 {len(actual)}자'
+
+
+class Checker:
+    """비교 결과를 모아 출력하고 실패 여부를 기록"""
+
+    def __init__(self):
+        self.failures = []
+
+    def same(self, case: str, expected: str, actual: str) -> None:
+        if expected == actual:
+            print(f'  OK    {case}')
+        else:
+            print(f'  FAIL  {case}: {_first_difference(expected, actual)}')
+            self.failures.append(case)
+
+    def fail(self, case: str, message: str) -> None:
+        print(f'  FAIL  {case}: {message}')
+        self.failures.append(case)
+
+
+def reference_outputs(root: Path) -> dict:
+    """현재 코드의 기준 경로: 단일 프로세스, 전체 필드 파싱, 캐시/스트리밍 없음
+
+    최적화 경로 비교와 골든 해시의 기준일 뿐 원래 구현과 같다는 보장은 아님 (check_baseline 참고).
+    """
+    days = _days()
+    roots = [(str(root), root)]
+    daily = [analyze_sessions.analyze_date(day, roots) for day in days]
+    return {
+        'daily': [result for result in daily if 'error' not in result],
+        'range': analyze_sessions.analyze_date_range(days[0], days[-1], roots),
+        'sampled': analyze_sessions.analyze_date_range(days[0], days[-1], roots, sample_rate=0.5, seed=7),
+    }
+
+
+def _baseline_differences(expected, actual, keys=()):
+    """원래 출력의 각 값이 현재 출력에서 어떻게 다른지 (키 경로, 기대, 실제). 현재 출력에만 있는 필드는 무시"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key, value in expected.items():
+            if key not in actual:
+                yield keys + (key,), value, '(없음)'
+            else:
+                yield from _baseline_differences(value, actual[key], keys + (key,))
+    elif isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        for value, other in zip(expected, actual):
+            yield from _baseline_differences(value, other, keys)
+    elif expected != actual:
+        yield keys, expected, actual
+
+
+def check_baseline(checker: Checker, reference: dict, path: Path = BASELINE_OUTPUTS) -> None:
+    """현재 출력이 최적화 이전 구현의 출력과 같은지 (BASELINE_CHANGES의 필드는 제외)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['outputs']
+    allowed = Counter()
+    for name, expected in baseline.items():
+        unexpected = []
+        for keys, old, new in _baseline_differences(json.loads(_dump(expected)), json.loads(_dump(reference[name]))):
+            if keys in BASELINE_CHANGES:
+                allowed[keys] += 1
+            else:
+                unexpected.append(f"{'.'.join(keys)}: 기대 {json.dumps(old, ensure_ascii=False)[:40]} / "
+                                  f"실제 {json.dumps(new, ensure_ascii=False)[:40]}")
+        if unexpected:
+            checker.fail(f'baseline {name}', f'{len(unexpected)}개 필드 다름, 첫 번째 {unexpected[0]}')
+        else:
+            print(f'  OK    baseline {name}')
+    for keys, count in allowed.items():
+        print(f"  NOTE  {'.'.join(keys)} {count}건 다름 (의도한 변경: {BASELINE_CHANGES[keys]})")
+
+
+def check_engines(checker: Checker, reference: dict, corpus: Path, root: Path, workers: int) -> None:
+    """최적화 경로별 출력이 기준 구현과 바이트 단위로 같은지 확인"""
+    days = _days()
+    roots = [(str(root), root)]
+    expected_range = _dump(reference['range'])
+    expected_daily = _dump(reference['daily'])
+
+    parallel = analyze_sessions.analyze_date_range(days[0], days[-1], roots, workers=workers)
+    checker.same(f'parallel (workers={workers})', expected_range, _dump(parallel))
+    parallel_daily = list(analyze_sessions.iter_daily_results(days[0], days[-1], roots, workers=workers))
+    checker.same(f'parallel daily (workers={workers})', expected_daily, _dump(parallel_daily))
+
+    split_roots = [(label, corpus / label) for label in ROOT_SPLIT]
+    combined = analyze_sessions.analyze_date_range(days[0], days[-1], split_roots, workers=workers)
+    by_root = combined.pop('by_root', {})
+    checker.same('multi-root combined', expected_range, _dump(combined))
+    for label, path in split_roots:
+        single = analyze_sessions.analyze_date_range(days[0], days[-1], [(label, path)])
+        checker.same(f'multi-root by_root[{label}]', _dump(single), _dump(by_root.get(label)))
+
+    service = analyze_sessions.ReportService(roots)
+    cold, cold_hit = service.analyze(days[0], days[-1])
+    warm, warm_hit = service.analyze(days[0], days[-1])
+    checker.same('serve cache (miss)', expected_range, _dump(cold))
+    checker.same('serve cache (hit)', expected_range, _dump(warm))
+    if cold_hit or not warm_hit:
+        checker.fail('serve cache', f'적중 여부가 예상과 다름 (첫 조회 {cold_hit}, 재조회 {warm_hit})')
+
+    ndjson_path = corpus / 'out' / 'range.ndjson'
+    with contextlib.redirect_stdout(io.StringIO()) as stdout, contextlib.redirect_stderr(io.StringIO()):
+        analyze_sessions.stream_ndjson_output(
+            analyze_sessions.iter_daily_results(days[0], days[-1], roots), str(ndjson_path))
+    expected_lines = ''.join(json.dumps(result, ensure_ascii=False, separators=(',', ':')) + '\n'
+                             for result in reference['daily'])
+    checker.same('ndjson stdout', expected_lines, stdout.getvalue())
+    checker.same('ndjson file', expected_lines, ndjson_path.read_text(encoding='utf-8'))
+
+    archive = corpus / 'archive'
+    files = sorted(p for p in root.rglob('*.jsonl'))
+    with contextlib.redirect_stderr(io.StringIO()):
+        summary = analyze_sessions.compact_sessions(files, root, archive)
+    if summary['mismatched']:
+        checker.fail('compact archive', f"축약 검증 실패 {len(summary['mismatched'])}개")
+    archived = analyze_sessions.analyze_date_range(days[0], days[-1], [(str(root), archive)])
+    checker.same('compact archive', expected_range, _dump(archived))
+
+    for name, (keys, _) in analyze_sessions.REPORT_SECTIONS.items():
+        partial = analyze_sessions.analyze_date_range(days[0], days[-1], roots, sections=(name,))
+        checker.same(f'sections={name}',
+                     _dump({key: reference['range'][key] for key in keys}),
+                     _dump({key: partial.get(key) for key in keys}))
+
+    params = analyze_sessions.manifest_params(roots, {})
+    with contextlib.redirect_stderr(io.StringIO()):
+        analyze_sessions.run_backfill(days[0], days[-1], roots, {}, params, manifest=None,
+                                      save=True, workers=workers)
+    saved = []
+    for day in days:
+        path = Path(analyze_sessions.get_json_output_path('auto', day))
+        if path.exists():
+            saved.append(json.loads(path.read_text(encoding='utf-8')))
+    checker.same(f'backfill files (workers={workers})', expected_daily, _dump(saved))
+
+
+def _run_stages(root: Path, start: datetime, end: datetime, measure) -> None:
+    """기준 경로를 단계별로 실행. measure(stage, func)가 func를 실행하고 결과를 반환"""
+    discovered = measure('discovery', lambda: analyze_sessions.discover_sessions(root, start, end))
+    parsed = measure('parse', lambda: [analyze_sessions._parse_valid_session(p) for p, _ in discovered])
+    sessions = [s for s in parsed if s is not None]
+    result = measure('scoring', lambda: analyze_sessions._build_analysis_result(sessions, start, end))
+    measure('serialization', lambda: _dump(result))
+
+
+def measure_stages(root: Path, repeat: int) -> dict:
+    """기준 경로의 단계별 최소 소요 시간(초)과 단계 중 최대 추가 메모리(KiB)"""
+    days = _days()
+    start = datetime.strptime(days[0], '%Y-%m-%d')
+    end = datetime.strptime(days[-1], '%Y-%m-%d').replace(hour=23, minute=59, second=59, microsecond=999999)
+    seconds = {name: float('inf') for name in STAGES}
+    peak_kib = {}
+
+    def timed(name, func):
+        began = time.perf_counter()
+        value = func()
+        seconds[name] = min(seconds[name], time.perf_counter() - began)
+        return value
+
+    def traced(name, func):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        value = func()
+        peak_kib[name] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+        return value
+
+    analyze_sessions.get_skill_registry()
+    for _ in range(repeat):
+        _run_stages(root, start, end, timed)
+    # 추적 오버헤드가 시간 측정에 섞이지 않도록 메모리는 별도 1회 실행으로 측정
+    tracemalloc.start()
+    try:
+        _run_stages(root, start, end, traced)
+    finally:
+        tracemalloc.stop()
+    return {name: {'seconds': seconds[name], 'peak_kib': peak_kib[name]} for name in STAGES}
+
+
+def check_budgets(checker: Checker, measured: dict, budgets: dict) -> None:
+    print(f"  {'stage':<14} {'seconds':>9} {'budget':>9} {'peak KiB':>10} {'budget':>10}")
+    for name in STAGES:
+        stage, budget = measured[name], budgets.get(name, {})
+        print(f"  {name:<14} {stage['seconds']:>9.3f} {budget.get('seconds', float('nan')):>9.3f} "
+              f"{stage['peak_kib']:>10.0f} {budget.get('peak_kib', float('nan')):>10.0f}")
+        if not budget:
+            checker.fail(f'budget {name}', '예산 없음 (--update-golden으로 기록)')
+            continue
+        if stage['seconds'] > budget['seconds']:
+            checker.fail(f'budget {name}', f"시간 초과 {stage['seconds']:.3f}s > {budget['seconds']:.3f}s")
+        if stage['peak_kib'] > budget['peak_kib']:
+            checker.fail(f'budget {name}', f"메모리 초과 {stage['peak_kib']:.0f}KiB > {budget['peak_kib']:.0f}KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session Analyzer 골든 출력 동등성/성능 예산 검사')
+    parser.add_argument('--golden', type=Path, default=DEFAULT_GOLDEN,
+                        help=f'기준 출력 해시와 예산 파일 (기본: {DEFAULT_GOLDEN.name})')
+    parser.add_argument('--update-golden', action='store_true',
+                        help='현재 기준 출력 해시와 측정값(+여유분)을 예산으로 기록')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='병렬 경로 검사에 쓸 프로세스 수 (기본: 4)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='단계별 시간 측정 반복 횟수, 최솟값 사용 (기본: 3)')
+    parser.add_argument('--skip-budgets', action='store_true',
+                        help='시간/메모리 예산 검사 생략 (출력 동등성만 확인)')
+    parser.add_argument('--time-headroom', type=float, default=1.0,
+                        help=f'--update-golden 시 시간 예산 여유 비율 (기본: 1.0 = 측정값의 2배 + {TIME_BUDGET_FLOOR}초)')
+    parser.add_argument('--memory-headroom', type=float, default=0.25,
+                        help='--update-golden 시 메모리 예산 여유 비율 (기본: 0.25)')
+    parser.add_argument('--keep-corpus', type=Path, metavar='DIR',
+                        help='코퍼스/출력을 임시 디렉토리 대신 DIR에 만들고 남겨 둠')
+    args = parser.parse_args()
+
+    work_dir = args.keep_corpus or Path(tempfile.mkdtemp(prefix='session-analyzer-golden-'))
+    if args.keep_corpus and work_dir.exists():
+        shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    # 스킬 레지스트리/요약 저장 경로가 실제 사용자 환경에 의존하지 않도록 HOME 격리
+    home = work_dir / 'home'
+    build_home(home)
+    os.environ['HOME'] = str(home)
+    root = work_dir / 'projects'
+    files = build_corpus(root)
+    for label, projects in ROOT_SPLIT.items():
+        for project in projects:
+            shutil.copytree(root / project, work_dir / label / project)
+
+    checker = Checker()
+    try:
+        print(f'코퍼스: {files}개 세션 파일 ({work_dir})')
+        reference = reference_outputs(root)
+        digests = {name: _digest(_dump(value)) for name, value in reference.items()}
+
+        print('\n[원래 구현과 비교]')
+        check_baseline(checker, reference)
+
+        print('\n[기준 출력]')
+        golden = {}
+        if args.golden.exists():
+            with open(args.golden, 'r', encoding='utf-8') as f:
+                golden = json.load(f)
+        if golden.get('version') != GOLDEN_VERSION:
+            golden = {}
+        for name, digest in digests.items():
+            if args.update_golden:
+                print(f'  SET   {name}: {digest[:16]}')
+            elif name not in golden.get('outputs', {}):
+                checker.fail(name, '골든 해시 없음 (--update-golden으로 기록)')
+            elif golden['outputs'][name] != digest:
+                checker.fail(name, f"골든 해시와 다름 ({golden['outputs'][name][:16]} → {digest[:16]})")
+            else:
+                print(f'  OK    {name}')
+
+        print('\n[최적화 경로 동등성]')
+        check_engines(checker, reference, work_dir, root, args.workers)
+
+        measured = None
+        if not args.skip_budgets or args.update_golden:
+            print('\n[단계별 예산]')
+            measured = measure_stages(root, args.repeat)
+            if not args.update_golden:
+                check_budgets(checker, measured, golden.get('budgets', {}))
+
+        if args.update_golden:
+            if checker.failures:
+                print('\n최적화 경로가 기준과 달라 골든 파일을 갱신하지 않았습니다.', file=sys.stderr)
+            else:
+                golden = {
+                    'version': GOLDEN_VERSION,
+                    'outputs': digests,
+                    'budgets': {
+                        name: {
+                            'seconds': round(stage['seconds'] * (1 + args.time_headroom) + TIME_BUDGET_FLOOR, 4),
+                            'peak_kib': round(stage['peak_kib'] * (1 + args.memory_headroom)),
+                        }
+                        for name, stage in measured.items()
+                    },
+                }
+                with open(args.golden, 'w', encoding='utf-8') as f:
+                    json.dump(golden, f, ensure_ascii=False, indent=2)
+                    f.write('\n')
+                check_budgets(checker, measured, golden['budgets'])
+                print(f'\n골든 파일 갱신: {args.golden}')
+    finally:
+        if not args.keep_corpus:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if checker.failures:
+        print(f"\n실패 {len(checker.failures)}건: {', '.join(checker.failures)}")
+        sys.exit(1)
+    print('\n통과')
+
+
+if __name__ == '__main__':
+    main()